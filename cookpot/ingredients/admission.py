@@ -0,0 +1,120 @@
+"""Admission control for expensive pairing requests.
+
+Ranking suggestions for a selection with many molecules keeps the database busy for a
+while. If too many of these calculations run at once, every other request slows down
+as well. Heavy calculations therefore need to pass an :class:`AdmissionGate`, which
+limits how many of them run concurrently in each process. Requests that can't get a
+slot in time are rejected so that clients retry later, instead of piling up.
+"""
+from __future__ import annotations
+
+import contextlib
+import threading
+import time
+from collections.abc import Iterator, Sequence
+from typing import Optional
+
+from django.conf import settings
+
+from .dataset import VersionedValue
+from .models import Ingredient
+
+#: Number of seconds that clients are asked to wait after a request was rejected.
+RETRY_AFTER = 5
+
+
+class Rejected(Exception):
+    """Raised when a request is not admitted."""
+
+
+class AdmissionGate:
+    """Limits the number of concurrent calculations.
+
+    Up to ``max_concurrent`` calculations may run at once. Up to ``max_waiting`` more
+    may wait (for at most ``timeout`` seconds) for one of them to finish. Everything
+    else is rejected immediately.
+    """
+
+    def __init__(self, max_concurrent: int, max_waiting: int, timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self._running_count = 0
+        self._waiting_count = 0
+
+    def try_acquire(self) -> bool:
+        """Try to get a slot. This blocks while waiting in the queue."""
+        with self._condition:
+            if self._running_count < self.max_concurrent:
+                self._running_count += 1
+                return True
+            if self._waiting_count >= self.max_waiting:
+                return False
+
+            self._waiting_count += 1
+            try:
+                deadline = time.monotonic() + self.timeout
+                while self._running_count >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+                self._running_count += 1
+                return True
+            finally:
+                self._waiting_count -= 1
+
+    def release(self) -> None:
+        with self._condition:
+            self._running_count -= 1
+            self._condition.notify()
+
+    @contextlib.contextmanager
+    def admit(self) -> Iterator[None]:
+        """Run a block of code in a slot.
+
+        :raises Rejected: If no slot is available.
+        """
+        if not self.try_acquire():
+            raise Rejected()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+_pairing_gate: Optional[AdmissionGate] = None
+
+
+def get_pairing_gate() -> AdmissionGate:
+    """Return the gate that heavy pairing calculations in this process go through."""
+    global _pairing_gate
+    if _pairing_gate is None:
+        _pairing_gate = AdmissionGate(
+            settings.PAIRING_HEAVY_CONCURRENCY,
+            settings.PAIRING_HEAVY_QUEUE_SIZE,
+            settings.PAIRING_HEAVY_QUEUE_TIMEOUT,
+        )
+    return _pairing_gate
+
+
+_molecule_counts = VersionedValue(
+    lambda: dict(
+        Ingredient.objects.filter_with_data().values_list("pk", "molecule_count")
+    )
+)
+
+
+def estimate_pairing_cost(ingredient_pks: Sequence[int]) -> int:
+    """Estimate how expensive calculating the pairing results for a selection is.
+
+    The estimate is the number of molecule occurrences of the selected ingredients,
+    which is roughly the number of molecules that need to be scored.
+    """
+    molecule_counts = _molecule_counts.get()
+    return sum(molecule_counts.get(pk, 0) for pk in set(ingredient_pks))
+
+
+def is_heavy_pairing(ingredient_pks: Sequence[int]) -> bool:
+    return estimate_pairing_cost(ingredient_pks) > settings.PAIRING_HEAVY_COST
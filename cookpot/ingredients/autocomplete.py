@@ -0,0 +1,96 @@
+"""In-memory prefix index for autocompleting ingredient names.
+
+The index is a sorted array of folded labels, which is searched with binary search.
+Results for very short prefixes match a large part of the array, so their completions
+are precomputed.
+"""
+import bisect
+from collections.abc import Iterable
+from typing import NamedTuple
+
+from .dataset import VersionedValue
+from .models import IngredientName
+from .search import fold
+
+#: Maximum number of completions that can be requested at once.
+MAX_COMPLETIONS = 25
+
+#: Completions for prefixes up to this length are precomputed.
+PRECOMPUTED_PREFIX_LENGTH = 2
+
+
+class Completion(NamedTuple):
+    priority: int
+    folded_label: str
+    label: str
+    ingredient_id: int
+
+
+def _collect(candidates: Iterable[Completion], limit: int) -> list[Completion]:
+    """Take the best completions, using at most one name per ingredient."""
+    result = list[Completion]()
+    seen_ingredient_ids = set[int]()
+    for completion in sorted(candidates):
+        if completion.ingredient_id in seen_ingredient_ids:
+            continue
+        seen_ingredient_ids.add(completion.ingredient_id)
+        result.append(completion)
+        if len(result) >= limit:
+            break
+    return result
+
+
+class CompletionIndex:
+    def __init__(self, completions: Iterable[Completion]):
+        self.completions = sorted(
+            completions, key=lambda completion: completion.folded_label
+        )
+        self.keys = [completion.folded_label for completion in self.completions]
+
+        candidates_by_prefix = dict[str, list[Completion]]()
+        for completion in self.completions:
+            for length in range(1, PRECOMPUTED_PREFIX_LENGTH + 1):
+                if len(completion.folded_label) >= length:
+                    candidates_by_prefix.setdefault(
+                        completion.folded_label[:length], []
+                    ).append(completion)
+        self.precomputed = {
+            prefix: _collect(candidates, MAX_COMPLETIONS)
+            for prefix, candidates in candidates_by_prefix.items()
+        }
+
+    @classmethod
+    def from_database(cls) -> "CompletionIndex":
+        return cls(
+            Completion(priority, fold(label), label, ingredient_id)
+            for ingredient_id, priority, label in (
+                IngredientName.objects.filter(ingredient__has_data=True)
+                .order_by()
+                .values_list("ingredient_id", "priority", "label")
+                .iterator()
+            )
+        )
+
+    def complete(self, prefix: str, limit: int) -> list[Completion]:
+        """Find names starting with the given prefix.
+
+        Completions are ordered by the priority of the name and then alphabetically.
+        Each ingredient is only returned once.
+        """
+        folded_prefix = fold(prefix)
+        if not folded_prefix:
+            return []
+        if len(folded_prefix) <= PRECOMPUTED_PREFIX_LENGTH:
+            return self.precomputed.get(folded_prefix, [])[:limit]
+
+        start = bisect.bisect_left(self.keys, folded_prefix)
+        end = bisect.bisect_left(self.keys, folded_prefix + "\U0010ffff", lo=start)
+        return _collect(self.completions[start:end], limit)
+
+
+_completion_index = VersionedValue(CompletionIndex.from_database)
+
+
+def complete(prefix: str, limit: int) -> list[Completion]:
+    """Autocomplete an ingredient name using the index of the current dataset."""
+    return _completion_index.get().complete(prefix, min(limit, MAX_COMPLETIONS))
@@ -0,0 +1,144 @@
+"""Helpers for commands that send many requests and report on their latency."""
+from __future__ import annotations
+
+import math
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from django import db
+from django.conf import settings
+from django.test import Client
+from django.test.utils import override_settings
+
+
+class Sample(NamedTuple):
+    label: str
+    latency: float
+    status_code: int
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Return a percentile (using the nearest-rank method) of a sorted list."""
+    if not sorted_values:
+        return float("nan")
+    # The nearest rank is the smallest one that covers the fraction of values.
+    rank = math.ceil(fraction * len(sorted_values))
+    index = max(0, min(len(sorted_values) - 1, rank - 1))
+    return sorted_values[index]
+
+
+class InProcessTarget:
+    """Sends requests directly to the Django application in this process.
+
+    Each thread gets its own test client and database connection.
+
+    :param disabled_caches: Aliases of caches that are replaced with a dummy cache
+        while requests are sent, so that every request calculates their values again.
+    """
+
+    def __init__(self, *, disabled_caches: Iterable[str] = ()) -> None:
+        self._local = threading.local()
+        self._settings_override = override_settings(
+            # The test client always uses this host name.
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            CACHES={
+                **settings.CACHES,
+                **{
+                    alias: {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+                    for alias in disabled_caches
+                },
+            },
+        )
+
+    def __enter__(self) -> InProcessTarget:
+        self._settings_override.enable()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self._settings_override.disable()
+
+    def __call__(self, url: str) -> int:
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = Client()
+        status_code = client.get(url).status_code
+        assert isinstance(status_code, int)
+        return status_code
+
+
+class HttpTarget:
+    """Sends requests to a running server over HTTP."""
+
+    def __init__(self, base_url: str, *, timeout: float = 60):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def __call__(self, url: str) -> int:
+        try:
+            with urllib.request.urlopen(
+                self.base_url + url, timeout=self.timeout
+            ) as response:
+                response.read()
+                status_code = response.status
+        except urllib.error.HTTPError as error:
+            status_code = error.code
+        assert isinstance(status_code, int)
+        return status_code
+
+
+def run_requests(
+    requests: Iterable[tuple[str, str]],
+    send: Callable[[str], int],
+    *,
+    concurrency: int,
+) -> list[Sample]:
+    """Send requests using a number of concurrent clients.
+
+    :param requests: Tuples of a label (which is used for grouping in the report) and
+        the URL to request.
+    :param send: Callable that performs a request and returns the status code.
+    """
+
+    def run(request: tuple[str, str]) -> Sample:
+        label, url = request
+        start = time.perf_counter()
+        try:
+            status_code = send(url)
+        except Exception:
+            status_code = 0
+        finally:
+            db.close_old_connections()
+        return Sample(label, time.perf_counter() - start, status_code)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(run, requests))
+
+
+def format_report(samples: list[Sample], duration: float) -> list[str]:
+    """Summarize the latency distribution of each label as a table."""
+    samples_by_label = dict[str, list[Sample]]()
+    for sample in samples:
+        samples_by_label.setdefault(sample.label, []).append(sample)
+
+    lines = [
+        f"{'endpoint':<24} {'count':>7} {'errors':>7} {'req/s':>8} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    ]
+    for label, label_samples in sorted(samples_by_label.items()):
+        latencies = sorted(sample.latency * 1000 for sample in label_samples)
+        error_count = sum(
+            1 for sample in label_samples if not 200 <= sample.status_code < 400
+        )
+        lines.append(
+            f"{label:<24} {len(latencies):>7} {error_count:>7} "
+            f"{len(latencies) / duration:>8.1f} "
+            f"{percentile(latencies, 0.5):>9.1f} {percentile(latencies, 0.95):>9.1f} "
+            f"{percentile(latencies, 0.99):>9.1f} {latencies[-1]:>9.1f}"
+        )
+    lines.append(f"Total: {len(samples)} requests in {duration:.1f}s")
+    return lines
@@ -0,0 +1,87 @@
+"""HTTP caching for views that only depend on the dataset."""
+import asyncio
+import functools
+from calendar import timegm
+from collections.abc import Callable
+from typing import Any, Optional, TypeVar
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .concurrency import run_query
+from .dataset import get_current_version
+from .models import DatasetVersion
+
+ViewFunction = TypeVar("ViewFunction", bound=Callable[..., Any])
+
+
+def _get_validators(version: Optional[DatasetVersion]) -> Optional[tuple[str, int]]:
+    if version is None:
+        return None
+    return (
+        quote_etag(f"dataset-{version.pk}"),
+        timegm(version.created_at.utctimetuple()),
+    )
+
+
+def _get_conditional_response(
+    request: HttpRequest, validators: Optional[tuple[str, int]]
+) -> Optional[HttpResponse]:
+    if validators is None or request.method not in ("GET", "HEAD"):
+        return None
+    etag, last_modified = validators
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    assert response is None or isinstance(response, HttpResponse)
+    return response
+
+
+def _patch_response(
+    response: HttpResponse, validators: Optional[tuple[str, int]]
+) -> HttpResponse:
+    if validators is None or response.status_code not in (200, 304):
+        return response
+    etag, last_modified = validators
+    if not response.has_header("ETag"):
+        response.headers["ETag"] = etag
+    if not response.has_header("Last-Modified"):
+        response.headers["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=settings.HTTP_CACHE_MAX_AGE)
+    return response
+
+
+def dataset_conditional(view: ViewFunction) -> ViewFunction:
+    """Decorate a view so that it supports conditional GET requests.
+
+    The response is assumed to only change when the dataset version does. A strong
+    ETag and ``Last-Modified`` header derived from the version are added to successful
+    responses and matching conditional requests are answered with 304 before the view
+    runs. Unlike Django's own ``condition`` decorator, this also supports asynchronous
+    views.
+    """
+    if asyncio.iscoroutinefunction(view):
+
+        @functools.wraps(view)
+        async def async_inner(
+            request: HttpRequest, *args: Any, **kwargs: Any
+        ) -> HttpResponse:
+            validators = _get_validators(await run_query(get_current_version))
+            response = _get_conditional_response(request, validators)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            return _patch_response(response, validators)
+
+        return async_inner  # type: ignore
+
+    @functools.wraps(view)
+    def inner(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+        validators = _get_validators(get_current_version())
+        response = _get_conditional_response(request, validators)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        return _patch_response(response, validators)
+
+    return inner  # type: ignore
@@ -0,0 +1,121 @@
+"""Compression of static files and data responses.
+
+Static files are compressed once, when they are collected (see the ``buildstatic``
+command): :class:`CompressedManifestStaticFilesStorage` adds a content hash to each
+file name and writes ``.gz`` and ``.br`` variants next to it, which can be served
+directly by a proxy or by :func:`~cookpot.ingredients.views.static_file`. Data
+fragments are compressed on the fly by :class:`CompressionMiddleware`.
+"""
+import gzip
+import re
+from collections.abc import Iterator
+from typing import Any
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.http import HttpRequest, HttpResponse
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli  # type: ignore[import]
+except ImportError:
+    brotli = None
+
+#: File name suffix of the pre-compressed variant for each content encoding, in order
+#: of preference.
+VARIANT_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+#: Static files with these extensions get pre-compressed variants. WOFF2 fonts are
+#: already compressed.
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".json", ".map", ".svg", ".ttf", ".txt")
+
+#: Responses below these paths are compressed by :class:`CompressionMiddleware`.
+COMPRESSED_PATH_PREFIXES = ("/_data/",)
+
+#: Brotli quality for responses that are compressed on the fly. The maximum is much
+#: slower while only gaining a few percent.
+DYNAMIC_BROTLI_QUALITY = 5
+
+
+def get_compressed_variants(content: bytes) -> dict[str, bytes]:
+    """Compress content as well as possible, for serving it statically.
+
+    :return: The compressed content for each content encoding. Brotli is only
+        available when the brotli package is installed.
+    """
+    variants = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(content)
+    return variants
+
+
+def accepts_encoding(request: HttpRequest, encoding: str) -> bool:
+    """Check whether a client accepts responses in a content encoding."""
+    accept_encoding = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    return re.search(rf"\b{re.escape(encoding)}\b", accept_encoding) is not None
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Static files storage that writes compressed variants of the hashed files.
+
+    Variants are only kept when they are actually smaller than the original.
+    """
+
+    def post_process(
+        self, paths: dict[str, Any], dry_run: bool = False, **options: Any
+    ) -> Iterator[tuple[str, str, Any]]:
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.write_compressed_variants(name)
+
+    def write_compressed_variants(self, name: str) -> None:
+        with self.open(name) as file:
+            content = file.read()
+        for encoding, compressed in get_compressed_variants(content).items():
+            variant_name = name + VARIANT_SUFFIXES[encoding]
+            if self.exists(variant_name):
+                self.delete(variant_name)
+            if len(compressed) < len(content):
+                self._save(variant_name, ContentFile(compressed))
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Middleware that compresses the responses of the data views.
+
+    Brotli is used when the client accepts it and the brotli package is installed,
+    otherwise this behaves like Django's ``GZipMiddleware``. Pages are left alone, so
+    that a proxy can serve them with their own pre-compressed variants.
+    """
+
+    def process_response(
+        self, request: HttpRequest, response: HttpResponse
+    ) -> HttpResponse:
+        if not request.path.startswith(COMPRESSED_PATH_PREFIXES):
+            return response
+        if (
+            brotli is None
+            or response.streaming
+            or not accepts_encoding(request, "br")
+        ):
+            return super().process_response(request, response)
+
+        if len(response.content) < 200 or response.has_header("Content-Encoding"):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        compressed = brotli.compress(response.content, quality=DYNAMIC_BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers["Content-Length"] = str(len(compressed))
+        # Like GZipMiddleware, mark the ETag as weak because the representation
+        # changed. Conditional requests still match because they compare weakly.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+        return response
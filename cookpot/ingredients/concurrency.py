@@ -0,0 +1,183 @@
+"""Helpers for running blocking database work concurrently (or not at all)."""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional, TypeVar
+
+from django import db
+from django.conf import settings
+from django.core.cache import caches
+
+T = TypeVar("T")
+
+_query_executor: Optional[ThreadPoolExecutor] = None
+
+#: Execute wrappers (see Django's ``connection.execute_wrapper()``) that should also
+#: be installed for queries that run on the thread pool.
+_execute_wrappers = contextvars.ContextVar[tuple[Callable[..., Any], ...]](
+    "execute_wrappers", default=()
+)
+
+
+def get_query_executor() -> ThreadPoolExecutor:
+    """Return the shared thread pool that queries are run on.
+
+    The pool is bounded by the ``QUERY_THREAD_COUNT`` setting, which also bounds the
+    number of database connections a single worker process will open.
+    """
+    global _query_executor
+    if _query_executor is None:
+        _query_executor = ThreadPoolExecutor(
+            max_workers=settings.QUERY_THREAD_COUNT,
+            thread_name_prefix="cookpot-query",
+        )
+    return _query_executor
+
+
+@contextlib.contextmanager
+def execute_wrapper(wrapper: Callable[..., Any]) -> Iterator[None]:
+    """Install an execute wrapper on the default database connection.
+
+    In contrast to using ``connection.execute_wrapper()`` directly, the wrapper will
+    also be installed for queries that are started with :func:`run_query` from inside
+    this block.
+    """
+    token = _execute_wrappers.set((*_execute_wrappers.get(), wrapper))
+    try:
+        with db.connection.execute_wrapper(wrapper):
+            yield
+    finally:
+        _execute_wrappers.reset(token)
+
+
+def _call_with_connection_cleanup(function: Callable[[], T]) -> T:
+    try:
+        with contextlib.ExitStack() as stack:
+            for wrapper in _execute_wrappers.get():
+                stack.enter_context(db.connection.execute_wrapper(wrapper))
+            return function()
+    finally:
+        # Worker threads are not part of Django's request cycle, so nobody else
+        # closes their connections. This honors CONN_MAX_AGE just like the request
+        # handler would.
+        db.close_old_connections()
+
+
+async def run_query(function: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a (blocking) function that accesses the database on the query thread pool.
+
+    Use this together with :func:`asyncio.gather` to run independent queries
+    concurrently. Each call may use a different database connection, so this must
+    not be used for work that needs to happen inside a single transaction.
+    """
+    loop = asyncio.get_running_loop()
+    # Executors don't propagate context variables on their own.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_query_executor(),
+        functools.partial(
+            context.run,
+            _call_with_connection_cleanup,
+            functools.partial(function, *args, **kwargs),
+        ),
+    )
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calculations of the same value.
+
+    While a value is being calculated, other threads that ask for the same key wait
+    for that calculation and share its result instead of starting their own. Results
+    are also stored in a shared cache. A short-lived lock in that cache extends the
+    coalescing to other processes: they poll the cache for the result until the lock
+    is released or times out.
+
+    Whether the lock is exclusive depends on the cache backend's ``add()``. The
+    file-based cache may let two processes through at the same time, which only costs
+    a duplicate calculation.
+    """
+
+    def __init__(
+        self, cache_alias: str, *, lock_timeout: float = 30, poll_interval: float = 0.05
+    ):
+        self.cache_alias = cache_alias
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._calls = dict[tuple[str, Optional[int]], _Call]()
+
+    def get(
+        self, key: str, calculate: Callable[[], T], *, version: Optional[int] = None
+    ) -> T:
+        """Return the cached value for a key, calculating it at most once.
+
+        :param version: Cache version of the key.
+        """
+        with self._lock:
+            call = self._calls.get((key, version))
+            is_leader = call is None
+            if call is None:
+                call = self._calls[key, version] = _Call()
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result  # type: ignore[no-any-return]
+
+        try:
+            call.result = self._get_shared(key, calculate, version)
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key, version]
+            call.done.set()
+        return call.result  # type: ignore[no-any-return]
+
+    def _get_shared(
+        self, key: str, calculate: Callable[[], T], version: Optional[int]
+    ) -> T:
+        cache = caches[self.cache_alias]
+        result = cache.get(key, version=version)
+        if result is not None:
+            return result  # type: ignore[no-any-return]
+
+        lock_key = f"{key}:lock"
+        deadline = time.monotonic() + self.lock_timeout
+        has_lock = cache.add(lock_key, True, self.lock_timeout, version=version)
+        while not has_lock and time.monotonic() < deadline:
+            # Some other process is calculating the value.
+            time.sleep(self.poll_interval)
+            result = cache.get(key, version=version)
+            if result is not None:
+                return result  # type: ignore[no-any-return]
+            has_lock = cache.add(lock_key, True, self.lock_timeout, version=version)
+
+        try:
+            if has_lock:
+                # The previous holder may have finished just before we got the lock.
+                result = cache.get(key, version=version)
+                if result is not None:
+                    return result  # type: ignore[no-any-return]
+            result = calculate()
+            cache.set(key, result, version=version)
+            return result
+        finally:
+            if has_lock:
+                cache.delete(lock_key, version=version)
@@ -0,0 +1,127 @@
+"""Tracking of the current dataset version.
+
+The version is cached in the default cache so that it can be checked on every request
+without touching the database.
+"""
+import threading
+import time
+from collections.abc import Callable
+from typing import Any, Generic, Optional, TypeVar
+
+from django.core.cache import caches
+from django.utils import timezone
+
+from .models import DatasetVersion
+
+CACHE_KEY = "dataset_version"
+
+#: Number of seconds that a :class:`VersionedValue` is used without checking whether
+#: the dataset version changed. Looking up the version means a cache round trip, which
+#: would otherwise happen on every access.
+VERSION_CHECK_INTERVAL = 1.0
+
+T = TypeVar("T")
+
+
+def get_current_version() -> Optional[DatasetVersion]:
+    """Return the current dataset version or ``None``, if ``sync`` never ran."""
+    version = caches["default"].get(CACHE_KEY, None)
+    if version is None:
+        try:
+            version = DatasetVersion.objects.filter(published_at__isnull=False).latest()
+        except DatasetVersion.DoesNotExist:
+            return None
+        caches["default"].set(CACHE_KEY, version, None)
+    assert isinstance(version, DatasetVersion)
+    return version
+
+
+def get_median_foodb_content() -> Optional[float]:
+    """Return the median FooDB content of the current version, if it is known.
+
+    Pass this to :meth:`MoleculeOccurrenceQuerySet.with_score()
+    <cookpot.ingredients.models.MoleculeOccurrenceQuerySet.with_score>` so that the
+    median doesn't need to be calculated in every query.
+    """
+    version = get_current_version()
+    return version.median_foodb_content if version is not None else None
+
+
+def create_version(**metadata: Any) -> DatasetVersion:
+    """Create a new dataset version without announcing it.
+
+    Call this after the dataset has been modified. Derived data can then be stored
+    for the new version before :func:`publish_version` makes it the current one, so
+    that no request has to build it on demand.
+
+    :param metadata: Additional fields to set on the :class:`DatasetVersion`.
+    """
+    return DatasetVersion.objects.create(**metadata)
+
+
+def publish_version(version: DatasetVersion) -> None:
+    """Announce a version that was created with :func:`create_version`."""
+    version.published_at = timezone.now()
+    version.save(update_fields=["published_at"])
+    caches["default"].set(CACHE_KEY, version, None)
+
+
+class VersionedValue(Generic[T]):
+    """Process-local cache for a value that is derived from the dataset.
+
+    The value is computed on first access and again whenever the dataset version has
+    changed since. The version is checked at most every :data:`VERSION_CHECK_INTERVAL`
+    seconds, so a new version may be picked up that much later.
+
+    Only one thread computes the value at a time, without holding the lock. While it
+    does, other threads keep getting the previous value (if there is one) instead of
+    waiting.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._condition = threading.Condition()
+        self._value: Optional[T] = None
+        self._version_pk: Optional[int] = None
+        self._checked_at = 0.0
+        self._building = False
+
+    def get(self) -> T:
+        with self._condition:
+            if (
+                self._value is not None
+                and time.monotonic() - self._checked_at < VERSION_CHECK_INTERVAL
+            ):
+                return self._value
+
+        version = get_current_version()
+        version_pk = version.pk if version is not None else None
+        with self._condition:
+            while True:
+                if self._value is not None and self._version_pk == version_pk:
+                    self._checked_at = time.monotonic()
+                    return self._value
+                if not self._building:
+                    break
+                # Another thread is already computing the value.
+                if self._value is not None:
+                    return self._value
+                self._condition.wait()
+            self._building = True
+
+        value: Optional[T] = None
+        try:
+            value = self._factory()
+            return value
+        finally:
+            with self._condition:
+                if value is not None:
+                    self._value = value
+                    self._version_pk = version_pk
+                    self._checked_at = time.monotonic()
+                self._building = False
+                self._condition.notify_all()
+
+    def clear(self) -> None:
+        with self._condition:
+            self._value = None
@@ -0,0 +1,90 @@
+"""Reading FlavorDB entities from a local mirror.
+
+A mirror is a directory, or a zip or tar archive, that contains one ``<id>.json`` file
+per entity (in any subdirectory). Each file holds the response of the
+``entities_json`` endpoint for that ID. Entities that are known not to exist upstream
+(the endpoint answered "404 Not Found") can be recorded as files that contain
+``null``, so that they are skipped without a warning. The ``mirrorflavordb`` command
+creates such a mirror from the live API.
+
+This module doesn't use Django, so that the parsing functions can run in worker
+processes.
+"""
+import json
+import os
+import re
+import tarfile
+import zipfile
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+#: API endpoint that returns a single entity, given its ``id``.
+ENTITY_URL = "https://cosylab.iiitd.edu.in/flavordb/entities_json"
+
+_entity_file_re = re.compile(r"(?:^|/)(\d+)\.json$")
+
+
+def iter_mirror(path: str) -> Iterator[tuple[int, bytes]]:
+    """Yield the ID and raw content of each entity file in a mirror.
+
+    Entities from directories and zip archives are ordered by ID. Tar archives (which
+    can only be read sequentially when they are compressed) are streamed in archive
+    order instead, so that only one entity is held in memory at a time.
+    """
+    if os.path.isdir(path):
+        files = {
+            int(match.group(1)): file_path
+            for file_path in Path(path).rglob("*.json")
+            if (match := _entity_file_re.search(file_path.as_posix()))
+        }
+        for entity_id in sorted(files):
+            yield entity_id, files[entity_id].read_bytes()
+
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            names = {
+                int(match.group(1)): name
+                for name in archive.namelist()
+                if (match := _entity_file_re.search(name))
+            }
+            for entity_id in sorted(names):
+                yield entity_id, archive.read(names[entity_id])
+
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path, "r|*") as archive:
+            for member in archive:
+                match = _entity_file_re.search(member.name)
+                file = archive.extractfile(member) if match else None
+                if match and file is not None:
+                    yield int(match.group(1)), file.read()
+
+    else:
+        raise ValueError(
+            f"{path} is neither a directory nor a zip or tar archive of FlavorDB "
+            f"entities."
+        )
+
+
+def parse_entity(content: bytes) -> tuple[Any, str]:
+    """Parse the content of an entity file.
+
+    :return: The parsed data and an error message, which is empty when the content
+        could be parsed.
+    """
+    try:
+        return json.loads(content), ""
+    except ValueError as error:
+        return None, str(error)
+
+
+def write_entity(directory: Path, entity_id: int, content: bytes) -> None:
+    """Store the content of an entity file in a mirror directory.
+
+    The file is replaced atomically, so that an interrupted download never leaves a
+    truncated file behind.
+    """
+    path = directory / f"{entity_id}.json"
+    temporary_path = path.with_name(f".{path.name}.tmp")
+    temporary_path.write_bytes(content)
+    os.replace(temporary_path, path)
@@ -0,0 +1,454 @@
+"""Request and query instrumentation.
+
+Add :class:`MetricsMiddleware` to the ``MIDDLEWARE`` setting to collect per-view
+metrics. They are exported in the Prometheus text format by the ``metrics`` view. Note
+that metrics are kept in memory, so each worker process reports its own numbers.
+
+Similarly, :class:`SlowRequestCaptureMiddleware` writes slow requests to the
+``cookpot.slow_requests`` logger so that they can be replayed later.
+
+Finally, :class:`ProfilingMiddleware` allows profiling individual requests.
+"""
+from __future__ import annotations
+
+import bisect
+import cProfile
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+from collections.abc import Callable
+from typing import Any, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.template.base import Template
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from .concurrency import execute_wrapper
+
+#: Upper bounds of the request latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+#: Upper bounds of the query count histogram buckets.
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+#: Counters that are exported besides the per-view metrics, with their help texts.
+COUNTERS = {
+    "cookpot_expired_rankings_total": "Pages of suggestions that were requested after "
+    "their ranking expired, by reason.",
+}
+
+#: Number of statements (the slowest ones) that are explained in captured requests.
+CAPTURED_PLAN_COUNT = 3
+
+#: Number of functions that are listed in profiling results.
+PROFILE_FUNCTION_COUNT = 40
+
+capture_logger = logging.getLogger("cookpot.slow_requests")
+
+
+class QueryRecord(NamedTuple):
+    sql: str
+    params: Any
+    duration: float
+
+
+class QueryRecorder:
+    """Execute wrapper that keeps statistics about the queries it sees.
+
+    Use this with :func:`cookpot.ingredients.concurrency.execute_wrapper`. Queries
+    may be recorded from multiple threads at once.
+
+    :param keep_queries: Keep every query in :attr:`queries` and not just the
+        slowest one.
+    """
+
+    def __init__(self, *, keep_queries: bool = False):
+        self.keep_queries = keep_queries
+        self.queries = list[QueryRecord]()
+        self.count = 0
+        self.total_duration = 0.0
+        self.slowest: Optional[QueryRecord] = None
+        self._lock = threading.Lock()
+
+    def __call__(
+        self,
+        execute: Callable[..., Any],
+        sql: str,
+        params: Any,
+        many: bool,
+        context: dict[str, Any],
+    ) -> Any:
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            record = QueryRecord(sql, params, time.perf_counter() - start)
+            with self._lock:
+                self.count += 1
+                self.total_duration += record.duration
+                if self.slowest is None or record.duration > self.slowest.duration:
+                    self.slowest = record
+                if self.keep_queries:
+                    self.queries.append(record)
+
+
+def explain(sql: str, params: Any, *, analyze: bool = False) -> Optional[str]:
+    """Ask the database for the query plan of a statement.
+
+    :param analyze: Actually run the query to get timings, if the database supports
+        it. Only use this for read-only statements.
+    :return: The plan as text or ``None`` if it isn't available for this statement.
+    """
+    if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+
+    if connection.vendor == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+    elif connection.vendor == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        rows = cursor.fetchall()
+    if connection.vendor == "sqlite":
+        # Rows are (id, parent, unused, detail).
+        return "\n".join(row[3] for row in rows)
+    return "\n".join(row[0] for row in rows)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        # The last entry is the implicit +Inf bucket.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def render(self, name: str, labels: str) -> list[str]:
+        lines = list[str]()
+        cumulative_count = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative_count += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative_count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative_count}")
+        return lines
+
+
+class ViewMetrics:
+    def __init__(self) -> None:
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.query_count = Histogram(QUERY_COUNT_BUCKETS)
+        self.query_duration = 0.0
+        self.slowest_query_duration: Optional[float] = None
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._views = dict[str, ViewMetrics]()
+        self._counters = dict[tuple[str, str], int]()
+        self._lock = threading.Lock()
+
+    def observe(self, view_name: str, latency: float, recorder: QueryRecorder) -> None:
+        with self._lock:
+            metrics = self._views.setdefault(view_name, ViewMetrics())
+            metrics.latency.observe(latency)
+            metrics.query_count.observe(recorder.count)
+            metrics.query_duration += recorder.total_duration
+            if recorder.slowest is not None and (
+                metrics.slowest_query_duration is None
+                or recorder.slowest.duration > metrics.slowest_query_duration
+            ):
+                metrics.slowest_query_duration = recorder.slowest.duration
+
+    def increment(self, name: str, **labels: str) -> None:
+        """Increment one of the :data:`COUNTERS`.
+
+        Only use labels with a small, fixed set of values.
+        """
+        assert name in COUNTERS
+        label_text = ",".join(
+            f'{label}="{value}"' for label, value in sorted(labels.items())
+        )
+        with self._lock:
+            key = (name, label_text)
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def render(self) -> str:
+        """Export all metrics in the Prometheus text format."""
+        lines = [
+            "# HELP cookpot_request_duration_seconds Request latency.",
+            "# TYPE cookpot_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            views = sorted(self._views.items())
+            for view_name, metrics in views:
+                lines += metrics.latency.render(
+                    "cookpot_request_duration_seconds", f'view="{view_name}"'
+                )
+
+            lines += [
+                "# HELP cookpot_request_queries Number of SQL queries per request.",
+                "# TYPE cookpot_request_queries histogram",
+            ]
+            for view_name, metrics in views:
+                lines += metrics.query_count.render(
+                    "cookpot_request_queries", f'view="{view_name}"'
+                )
+
+            lines += [
+                "# HELP cookpot_query_duration_seconds_total Time spent in SQL queries.",
+                "# TYPE cookpot_query_duration_seconds_total counter",
+            ]
+            for view_name, metrics in views:
+                lines.append(
+                    f'cookpot_query_duration_seconds_total{{view="{view_name}"}} '
+                    f"{metrics.query_duration}"
+                )
+
+            # The statement itself isn't a label, because every distinct statement
+            # would create a new time series. Slow statements can be found in the
+            # captures of SlowRequestCaptureMiddleware instead.
+            lines += [
+                "# HELP cookpot_slowest_query_seconds Duration of the slowest query "
+                "seen so far.",
+                "# TYPE cookpot_slowest_query_seconds gauge",
+            ]
+            for view_name, metrics in views:
+                if metrics.slowest_query_duration is None:
+                    continue
+                lines.append(
+                    f'cookpot_slowest_query_seconds{{view="{view_name}"}} '
+                    f"{metrics.slowest_query_duration}"
+                )
+
+            for name, help_text in COUNTERS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for (counter_name, label_text), value in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(f"{name}{{{label_text}}} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._views.clear()
+            self._counters.clear()
+
+
+#: Metrics of this process.
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """Middleware that records latency and query statistics for each named view."""
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with execute_wrapper(recorder):
+            response = self.get_response(request)
+        latency = time.perf_counter() - start
+
+        resolver_match = getattr(request, "resolver_match", None)
+        if resolver_match is not None and resolver_match.url_name is not None:
+            registry.observe(resolver_match.url_name, latency, recorder)
+
+        return response
+
+
+def normalize_parameters(request: HttpRequest) -> dict[str, str]:
+    """Bring the query parameters of a request into a canonical form.
+
+    Requests that would produce the same result should end up with equal parameters.
+    """
+    parameters = dict[str, str]()
+    for key in sorted(request.GET):
+        value = request.GET.get(key, "")
+        assert isinstance(value, str)
+        value = value.strip()
+        if key == "ingredients":
+            items = [item.strip() for item in value.split(",")]
+            if all(item.isdigit() for item in items):
+                value = ",".join(str(item) for item in sorted(set(map(int, items))))
+        parameters[key] = value
+    return parameters
+
+
+class SlowRequestCaptureMiddleware:
+    """Middleware that captures slow requests to the data views.
+
+    Each captured request is logged as a line of JSON, containing the normalized
+    parameters, timings and the plans of the slowest queries. See the ``replay``
+    management command.
+    """
+
+    view_names = frozenset(["pairing_results", "section_cards"])
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        recorder = QueryRecorder(keep_queries=True)
+        start = time.perf_counter()
+        with execute_wrapper(recorder):
+            response = self.get_response(request)
+        latency = time.perf_counter() - start
+
+        resolver_match = getattr(request, "resolver_match", None)
+        if (
+            resolver_match is not None
+            and resolver_match.url_name in self.view_names
+            and response.status_code == 200
+            and latency >= settings.SLOW_REQUEST_THRESHOLD
+        ):
+            try:
+                self.capture(request, resolver_match.url_name, latency, recorder)
+            except Exception:
+                logging.exception("Could not capture slow request.")
+
+        return response
+
+    def capture(
+        self,
+        request: HttpRequest,
+        view_name: str,
+        latency: float,
+        recorder: QueryRecorder,
+    ) -> None:
+        slowest_queries = sorted(
+            recorder.queries, key=lambda query: query.duration, reverse=True
+        )[:CAPTURED_PLAN_COUNT]
+        capture_logger.info(
+            json.dumps(
+                {
+                    "time": timezone.now().isoformat(),
+                    "view": view_name,
+                    "parameters": normalize_parameters(request),
+                    "latency": latency,
+                    "query_count": recorder.count,
+                    "query_duration": recorder.total_duration,
+                    "slowest_queries": [
+                        {
+                            "sql": query.sql,
+                            "duration": query.duration,
+                            "plan": explain(query.sql, query.params),
+                        }
+                        for query in slowest_queries
+                    ],
+                }
+            )
+        )
+
+
+def _get_render_time(stats: pstats.Stats) -> float:
+    """Find the time spent rendering templates in a profile."""
+    render_code = Template.render.__code__
+    render_key = (
+        render_code.co_filename,
+        render_code.co_firstlineno,
+        render_code.co_name,
+    )
+    # Entries are (primitive calls, total calls, own time, cumulative time, callers).
+    # Recursive calls (for example from includes) are only counted once in the
+    # cumulative time.
+    entry = stats.stats.get(render_key)  # type: ignore[attr-defined]
+    if entry is None:
+        return 0.0
+    cumulative_time = entry[3]
+    assert isinstance(cumulative_time, float)
+    return cumulative_time
+
+
+class ProfilingMiddleware:
+    """Middleware that profiles single requests to the pairing and search views.
+
+    Profiling is triggered by adding the ``_profile`` query parameter or sending the
+    ``X-Profile`` header. It is only available for clients listed in the
+    ``INTERNAL_IPS`` setting, even in debug mode. Instead of the actual response, a
+    JSON document is returned that contains a cProfile summary, every SQL statement
+    with its timing and query plan and the time spent rendering templates.
+
+    Note that the profile only covers the request thread. Queries that asynchronous
+    views run on the thread pool are still listed, though.
+
+    This middleware is synchronous, which would make every request on an ASGI server
+    switch threads, so it isn't enabled by default. Add it to ``MIDDLEWARE`` where
+    profiling is needed.
+    """
+
+    view_names = frozenset(["pairing_results", "section_cards"])
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        self.get_response = get_response
+
+    def should_profile(self, request: HttpRequest) -> bool:
+        if "_profile" not in request.GET and "HTTP_X_PROFILE" not in request.META:
+            return False
+        if request.META.get("REMOTE_ADDR") not in settings.INTERNAL_IPS:
+            return False
+        try:
+            return resolve(request.path_info).url_name in self.view_names
+        except Resolver404:
+            return False
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        # Make sure the view actually does its work.
+        for header in ("HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE"):
+            request.META.pop(header, None)
+
+        recorder = QueryRecorder(keep_queries=True)
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        with execute_wrapper(recorder):
+            profile.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profile.disable()
+        total_time = time.perf_counter() - start
+
+        profile_output = io.StringIO()
+        stats = pstats.Stats(profile, stream=profile_output)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_FUNCTION_COUNT)
+
+        profile_response = JsonResponse(
+            {
+                "path": request.get_full_path(),
+                "status_code": response.status_code,
+                "total_time": total_time,
+                "render_time": _get_render_time(stats),
+                "query_count": recorder.count,
+                "query_time": recorder.total_duration,
+                "queries": [
+                    {
+                        "sql": query.sql,
+                        "params": [str(param) for param in query.params or ()],
+                        "duration": query.duration,
+                        "plan": explain(query.sql, query.params, analyze=True),
+                    }
+                    for query in recorder.queries
+                ],
+                "profile": profile_output.getvalue(),
+            },
+            json_dumps_params={"indent": 2},
+        )
+        profile_response.headers["Cache-Control"] = "no-store"
+        return profile_response
@@ -0,0 +1,82 @@
+"""Database-backed queue for pairing reports that are calculated in the background.
+
+When ``PAIRING_JOB_QUEUE`` is enabled, heavy pairing requests (see
+:mod:`cookpot.ingredients.admission`) don't calculate their report in the web worker.
+Instead, a :class:`~cookpot.ingredients.models.PairingJob` is created and the client
+polls for the result, while the ``pairingworker`` command does the calculation.
+"""
+import datetime
+from collections.abc import Sequence
+from typing import Optional
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from .models import DatasetVersion, PairingJob
+
+
+def get_selection_string(ingredient_pks: Sequence[int]) -> str:
+    return ",".join(str(pk) for pk in sorted(set(ingredient_pks)))
+
+
+def parse_selection_string(selection: str) -> list[int]:
+    return [int(value) for value in selection.split(",")]
+
+
+def enqueue_pairing_job(
+    version: DatasetVersion, ingredient_pks: Sequence[int]
+) -> PairingJob:
+    """Return the job for a selection, creating it if necessary.
+
+    Failed jobs are queued again.
+    """
+    job, _ = PairingJob.objects.get_or_create(
+        version=version, selection=get_selection_string(ingredient_pks)
+    )
+    if job.status == PairingJob.Status.FAILED:
+        PairingJob.objects.filter(pk=job.pk, status=PairingJob.Status.FAILED).update(
+            status=PairingJob.Status.PENDING, created_at=timezone.now()
+        )
+        job.status = PairingJob.Status.PENDING
+    return job
+
+
+def claim_next_job(version: DatasetVersion) -> Optional[PairingJob]:
+    """Find the oldest job that needs to be processed and mark it as running.
+
+    Jobs that have been running for longer than ``PAIRING_JOB_TIMEOUT`` are assumed
+    to belong to a worker that died and may be claimed again.
+    """
+    now = timezone.now()
+    stale_before = now - datetime.timedelta(seconds=settings.PAIRING_JOB_TIMEOUT)
+    claimable = PairingJob.objects.filter(
+        models.Q(status=PairingJob.Status.PENDING)
+        | models.Q(status=PairingJob.Status.RUNNING, started_at__lt=stale_before),
+        version=version,
+    )
+    while True:
+        job = claimable.order_by("created_at").first()
+        if job is None:
+            return None
+        # Another worker may have claimed the job in the meantime. Only one of the
+        # updates can match.
+        if claimable.filter(pk=job.pk).update(
+            status=PairingJob.Status.RUNNING, started_at=now
+        ):
+            job.status = PairingJob.Status.RUNNING
+            job.started_at = now
+            return job
+
+
+def finish_job(job: PairingJob, result: str) -> None:
+    job.status = PairingJob.Status.DONE
+    job.result = result
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "finished_at"])
+
+
+def fail_job(job: PairingJob) -> None:
+    job.status = PairingJob.Status.FAILED
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "finished_at"])
@@ -0,0 +1,55 @@
+import logging
+import shutil
+import subprocess
+from typing import Any
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile the stylesheet and collect all static files into STATIC_ROOT, with "
+        "content-hashed names and pre-compressed variants."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--skip-sass",
+            action="store_true",
+            help="Don't compile the stylesheet, for example because main.css was "
+            "already built by the package.",
+        )
+
+    def compile_stylesheet(self) -> None:
+        sass_binary = shutil.which(settings.SASS_BINARY)
+        if sass_binary is None:
+            raise CommandError(
+                f"Could not find the Sass compiler ({settings.SASS_BINARY}). Install "
+                "it, set SASS_BINARY or pass --skip-sass."
+            )
+        source = settings.BASE_DIR / "cookpot" / "static" / "main.scss"
+        try:
+            subprocess.run(
+                [
+                    sass_binary,
+                    "--no-source-map",
+                    "--style=compressed",
+                    f"{source}:{source.with_suffix('.css')}",
+                ],
+                check=True,
+            )
+        except subprocess.CalledProcessError as error:
+            raise CommandError("Compiling the stylesheet failed.") from error
+        logging.info("[Static build] compiled the stylesheet.")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if not options["skip_sass"]:
+            self.compile_stylesheet()
+        call_command(
+            "collectstatic", interactive=False, ignore_patterns=["*.scss"], verbosity=0
+        )
+        logging.info(
+            f"[Static build] collected static files into {settings.STATIC_ROOT}."
+        )
@@ -0,0 +1,174 @@
+import itertools
+import random
+import time
+from collections.abc import Callable, Iterator
+from contextlib import ExitStack
+from typing import Any
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.urls import reverse
+
+from cookpot.ingredients.benchmarking import (
+    HttpTarget,
+    InProcessTarget,
+    format_report,
+    run_requests,
+)
+from cookpot.ingredients.models import Ingredient, IngredientName
+from cookpot.ingredients.sections import get_sections
+
+DEFAULT_MIX = "index=1,section=4,search=3,pairing=2"
+
+
+class Command(BaseCommand):
+    help = (
+        "Send a realistic mix of requests to the application and report throughput "
+        "and latency per endpoint."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--url",
+            type=str,
+            default=None,
+            help=(
+                "Base URL of a running server (for example http://localhost:8000). "
+                "By default, requests are handled in this process."
+            ),
+        )
+        parser.add_argument(
+            "--clients",
+            type=int,
+            default=8,
+            help="Number of concurrent clients.",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=1000,
+            help="Total number of requests to send.",
+        )
+        parser.add_argument(
+            "--mix",
+            type=str,
+            default=DEFAULT_MIX,
+            help=(
+                "Relative weights of the different request types, out of index, "
+                f"section, search and pairing. Defaults to {DEFAULT_MIX!r}."
+            ),
+        )
+        parser.add_argument(
+            "--zipf-exponent",
+            type=float,
+            default=1.1,
+            help="Skew of the ingredient popularity in pairing requests.",
+        )
+        parser.add_argument("--seed", type=int, default=None)
+
+    def parse_mix(self, value: str) -> dict[str, float]:
+        mix = dict[str, float]()
+        for item in value.split(","):
+            try:
+                kind, weight = item.split("=")
+                mix[kind.strip()] = float(weight)
+            except ValueError:
+                raise CommandError(f"Invalid mix entry: {item!r}")
+        unknown_kinds = set(mix) - {"index", "section", "search", "pairing"}
+        if unknown_kinds:
+            raise CommandError(f"Unknown request types: {', '.join(unknown_kinds)}")
+        return mix
+
+    def generate_requests(
+        self, rng: random.Random, mix: dict[str, float], zipf_exponent: float
+    ) -> Iterator[tuple[str, str]]:
+        sections = [key for key, _ in get_sections()]
+        labels = list(
+            IngredientName.objects.filter(ingredient__has_data=True).values_list(
+                "label", flat=True
+            )
+        )
+        # Ingredients get a random popularity rank, following Zipf's law.
+        ingredient_pks = list(
+            Ingredient.objects.filter_with_data().values_list("pk", flat=True)
+        )
+        rng.shuffle(ingredient_pks)
+        ingredient_weights = list(
+            itertools.accumulate(
+                1 / (rank**zipf_exponent) for rank in range(1, len(ingredient_pks) + 1)
+            )
+        )
+        if not sections or not labels or not ingredient_pks:
+            raise CommandError("The database is empty. Run sync first.")
+
+        def make_index() -> tuple[str, str]:
+            return "index", reverse("index")
+
+        def make_section() -> tuple[str, str]:
+            return "section_cards", reverse("section_cards") + "?" + urlencode(
+                {"section": rng.choice(sections)}
+            )
+
+        def make_search() -> tuple[str, str]:
+            # Either search for a whole name or the start of one, as if the user was
+            # still typing.
+            label = rng.choice(labels)
+            if len(label) > 3 and rng.random() < 0.5:
+                label = label[: rng.randint(3, len(label))]
+            return "search", reverse("section_cards") + "?" + urlencode(
+                {"query": label}
+            )
+
+        def make_pairing() -> tuple[str, str]:
+            count = rng.randint(
+                1, min(settings.INGREDIENT_COUNT_CAP, len(ingredient_pks))
+            )
+            selection = set[int]()
+            while len(selection) < count:
+                selection.update(
+                    rng.choices(ingredient_pks, cum_weights=ingredient_weights)
+                )
+            return "pairing_results", reverse("pairing_results") + "?" + urlencode(
+                {"ingredients": ",".join(map(str, selection))}
+            )
+
+        factories: dict[str, Callable[[], tuple[str, str]]] = {
+            "index": make_index,
+            "section": make_section,
+            "search": make_search,
+            "pairing": make_pairing,
+        }
+        kinds = list(mix)
+        weights = [mix[kind] for kind in kinds]
+        while True:
+            yield factories[rng.choices(kinds, weights)[0]]()
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        rng = random.Random(options["seed"])
+        requests = list(
+            itertools.islice(
+                self.generate_requests(
+                    rng, self.parse_mix(options["mix"]), options["zipf_exponent"]
+                ),
+                options["requests"],
+            )
+        )
+
+        with ExitStack() as stack:
+            target: Callable[[str], int]
+            if options["url"] is not None:
+                target = HttpTarget(options["url"])
+            else:
+                target = stack.enter_context(InProcessTarget())
+
+            self.stderr.write(
+                f"Sending {len(requests)} requests with {options['clients']} "
+                f"clients…"
+            )
+            start = time.perf_counter()
+            samples = run_requests(requests, target, concurrency=options["clients"])
+            duration = time.perf_counter() - start
+
+        for line in format_report(samples, duration):
+            self.stdout.write(line)
@@ -0,0 +1,82 @@
+import logging
+from pathlib import Path
+from typing import Any
+
+import requests
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from cookpot.ingredients.flavordb import ENTITY_URL, parse_entity, write_entity
+
+
+class Command(BaseCommand):
+    help = (
+        "Download FlavorDB entities from the live API into a mirror directory that "
+        "can be passed to sync --flavordb-path."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("output", type=Path, help="Directory to write to.")
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=1000,
+            help="Number of entity IDs to probe, starting at zero.",
+        )
+        parser.add_argument(
+            "--refresh",
+            action="store_true",
+            help="Download entities again that are already in the mirror. By "
+            "default, an interrupted run can be resumed.",
+        )
+
+    def fetch_entity(self, session: requests.Session, entity_id: int) -> bytes:
+        """Download an entity.
+
+        :return: The content of the entity file, which is ``null`` when the entity
+            doesn't exist upstream.
+        """
+        response = session.get(
+            ENTITY_URL,
+            params={"id": entity_id},
+            headers={"Accept": "application/json"},
+        )
+        if response.status_code == 404:
+            return b"null"
+        response.raise_for_status()
+        _, error = parse_entity(response.content)
+        if error:
+            raise ValueError(f"invalid JSON: {error}")
+        return response.content
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        output: Path = options["output"]
+        if output.exists() and not output.is_dir():
+            raise CommandError(f"{output} is not a directory.")
+        output.mkdir(parents=True, exist_ok=True)
+
+        session = requests.Session()
+        written_count = missing_count = failed_count = 0
+        for entity_id in range(options["count"]):
+            if not options["refresh"] and (output / f"{entity_id}.json").exists():
+                continue
+            try:
+                content = self.fetch_entity(session, entity_id)
+            except:
+                # No file is written, so that the entity is tried again next time.
+                logging.exception(f"[FlavorDB] Entity {entity_id}: download failed.")
+                failed_count += 1
+                continue
+            write_entity(output, entity_id, content)
+            written_count += 1
+            if content == b"null":
+                missing_count += 1
+
+        logging.info(
+            f"[FlavorDB] wrote {written_count} entities ({missing_count} of them "
+            f"missing upstream) to {output}, {failed_count} failed."
+        )
+        if failed_count:
+            raise CommandError(
+                f"{failed_count} entities could not be downloaded. Run the command "
+                "again to retry them."
+            )
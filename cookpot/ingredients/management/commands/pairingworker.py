@@ -0,0 +1,68 @@
+import logging
+import time
+from typing import Any
+
+from django import db
+from django.core.management.base import BaseCommand, CommandParser
+from django.template.loader import render_to_string
+
+from cookpot.ingredients.dataset import get_current_version
+from cookpot.ingredients.jobs import (
+    claim_next_job,
+    fail_job,
+    finish_job,
+    parse_selection_string,
+)
+from cookpot.ingredients.models import PairingJob
+from cookpot.ingredients.views import PairingResultsView
+
+
+class Command(BaseCommand):
+    help = (
+        "Calculate pairing reports that were queued by the web application. Requires "
+        "the PAIRING_JOB_QUEUE setting."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=0.5,
+            help="Number of seconds to wait before looking for new jobs again.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once there are no more jobs, instead of waiting for new ones.",
+        )
+
+    def run_job(self, job: PairingJob) -> None:
+        start = time.perf_counter()
+        try:
+            result = render_to_string(
+                "data/pairing_results.html",
+                PairingResultsView.get_context_data(
+                    parse_selection_string(job.selection)
+                ),
+            )
+        except:
+            logging.exception(f"[Pairing worker] job {job.pk} failed.")
+            fail_job(job)
+            return
+        finish_job(job, result)
+        logging.info(
+            f"[Pairing worker] finished job {job.pk} ({job.selection}) in "
+            f"{time.perf_counter() - start:.2f}s."
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        while True:
+            db.close_old_connections()
+            version = get_current_version()
+            job = claim_next_job(version) if version is not None else None
+            if job is not None:
+                self.run_job(job)
+            elif options["once"]:
+                break
+            else:
+                time.sleep(options["poll_interval"])
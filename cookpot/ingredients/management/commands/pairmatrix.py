@@ -0,0 +1,214 @@
+import collections
+import contextlib
+import json
+import logging
+import os
+import sys
+import time
+from collections.abc import Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, TextIO
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from scipy import sparse  # type: ignore[import]
+
+from cookpot.ingredients.models import Ingredient, MoleculeOccurrence
+from cookpot.ingredients.pairmatrix import (
+    Tile,
+    calculate_tile,
+    init_worker,
+    normalize_scores,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Calculate the weighted score of every pair of ingredients and stream the "
+        "non-zero ones as newline-delimited JSON."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="File to write to. The default is standard output.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=["pairs", "columns"],
+            default="pairs",
+            help="Write one object per pair ('pairs') or one object with a list per "
+            "field for each block of pairs ('columns').",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.0,
+            help="Leave out pairs with a lower score.",
+        )
+        parser.add_argument(
+            "--block-size",
+            type=int,
+            default=1024,
+            help="Number of ingredients per side of each block that is calculated at "
+            "once. Memory use grows with the square of this.",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of worker processes.",
+        )
+
+    def load_matrices(
+        self,
+    ) -> tuple[np.ndarray, sparse.csr_matrix, sparse.csr_matrix]:
+        """Load the scores and occurrences of all data-bearing ingredients.
+
+        :return: The ingredient IDs (in the order of the matrix rows), the
+            row-normalized score matrix and the occurrence matrix.
+        """
+        ingredient_ids = np.array(
+            Ingredient.objects.filter_with_data()
+            .order_by("pk")
+            .values_list("pk", flat=True),
+            dtype=np.int64,
+        )
+        ingredient_indices = {
+            ingredient_id: index
+            for index, ingredient_id in enumerate(ingredient_ids.tolist())
+        }
+        molecule_indices = dict[int, int]()
+        occurrence_rows, occurrence_columns = list[int](), list[int]()
+        score_rows, score_columns, scores = list[int](), list[int](), list[float]()
+
+        for ingredient_id, molecule_id, score in (
+            MoleculeOccurrence.objects.with_score(filter_zero=False)
+            .values_list("ingredient_id", "molecule_id", "score")
+            .iterator()
+        ):
+            row = ingredient_indices.get(ingredient_id)
+            if row is None:
+                continue
+            column = molecule_indices.setdefault(molecule_id, len(molecule_indices))
+            occurrence_rows.append(row)
+            occurrence_columns.append(column)
+            if score is not None and score > 0:
+                score_rows.append(row)
+                score_columns.append(column)
+                scores.append(score)
+
+        shape = (len(ingredient_ids), len(molecule_indices))
+        score_matrix = sparse.csr_matrix(
+            (np.array(scores, dtype=np.float64), (score_rows, score_columns)),
+            shape=shape,
+        )
+        occurrence_matrix = sparse.csr_matrix(
+            (
+                np.ones(len(occurrence_rows), dtype=np.float64),
+                (occurrence_rows, occurrence_columns),
+            ),
+            shape=shape,
+        )
+        return ingredient_ids, normalize_scores(score_matrix), occurrence_matrix
+
+    def calculate_tiles(
+        self,
+        matrices: tuple[sparse.csr_matrix, sparse.csr_matrix],
+        block_size: int,
+        threshold: float,
+        processes: int,
+    ) -> Iterator[Tile]:
+        """Calculate all tiles, in order.
+
+        Only a few tiles per process are in flight at a time, so that finished tiles
+        don't pile up while the output is being written.
+        """
+        count = matrices[0].shape[0]
+        ranges = [
+            (start, min(start + block_size, count))
+            for start in range(0, count, block_size)
+        ]
+        tiles = (
+            (row_range, column_range) for row_range in ranges for column_range in ranges
+        )
+
+        if processes == 1:
+            init_worker(*matrices)
+            for row_range, column_range in tiles:
+                yield calculate_tile(row_range, column_range, threshold)
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=processes, initializer=init_worker, initargs=matrices
+        ) as executor:
+            pending = collections.deque[Future[Tile]]()
+            for row_range, column_range in tiles:
+                pending.append(
+                    executor.submit(calculate_tile, row_range, column_range, threshold)
+                )
+                if len(pending) >= 2 * processes:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def write_tile(
+        self, output: TextIO, ingredient_ids: np.ndarray, tile: Tile, format: str
+    ) -> None:
+        rows, columns, scores = tile
+        ingredients = ingredient_ids[rows].tolist()
+        candidates = ingredient_ids[columns].tolist()
+        if format == "columns":
+            json.dump(
+                {
+                    "ingredient": ingredients,
+                    "candidate": candidates,
+                    "score": scores.tolist(),
+                },
+                output,
+                separators=(",", ":"),
+            )
+            output.write("\n")
+            return
+        output.writelines(
+            f'{{"ingredient":{ingredient},"candidate":{candidate},"score":{score!r}}}\n'
+            for ingredient, candidate, score in zip(
+                ingredients, candidates, scores.tolist()
+            )
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options["block_size"] < 1 or options["processes"] < 1:
+            raise CommandError("--block-size and --processes must be positive.")
+
+        start = time.perf_counter()
+        ingredient_ids, score_matrix, occurrence_matrix = self.load_matrices()
+        logging.info(
+            f"[Pair matrix] loaded {len(ingredient_ids)} ingredients and "
+            f"{occurrence_matrix.nnz} molecule occurrences."
+        )
+
+        pair_count = 0
+        with contextlib.ExitStack() as stack:
+            output = (
+                sys.stdout
+                if options["output"] == "-"
+                else stack.enter_context(open(Path(options["output"]), "w"))
+            )
+            for tile in self.calculate_tiles(
+                (score_matrix, occurrence_matrix),
+                options["block_size"],
+                options["threshold"],
+                options["processes"],
+            ):
+                if len(tile[0]) == 0:
+                    continue
+                self.write_tile(output, ingredient_ids, tile, options["format"])
+                pair_count += len(tile[0])
+
+        logging.info(
+            f"[Pair matrix] wrote {pair_count} pairs in "
+            f"{time.perf_counter() - start:.1f}s."
+        )
@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from cookpot.ingredients.compression import (
+    VARIANT_SUFFIXES,
+    brotli,
+    get_compressed_variants,
+)
+from cookpot.ingredients.dataset import get_current_version
+from cookpot.ingredients.models import Ingredient
+from cookpot.ingredients.sections import get_sections
+
+#: Number of old exports that are kept next to the current one, so that requests which
+#: are in flight during a switch can still be answered.
+KEEP_PREVIOUS_EXPORTS = 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the pages that only depend on the dataset as static files, so that a "
+        "proxy can serve them directly. Run this after sync."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--output",
+            type=Path,
+            default=settings.DATA_DIR / "site",
+            help="Directory to export to. Each export is written into a subdirectory "
+            "named after the dataset version and the 'current' link is updated.",
+        )
+        parser.add_argument(
+            "--skip-pairing-reports",
+            action="store_true",
+            help="Don't export the pairing reports of single ingredients.",
+        )
+
+    def get_urls(self, skip_pairing_reports: bool) -> list[tuple[str, str]]:
+        """Return the URLs that are exported and the path of each file."""
+        section_cards_url = reverse("section_cards")
+        urls = [(reverse("index"), "index.html")]
+        urls.extend(
+            (
+                f"{section_cards_url}?{urlencode({'section': section})}",
+                f"{section_cards_url.strip('/')}/{section}.html",
+            )
+            for section, _ in get_sections()
+        )
+        if not skip_pairing_reports:
+            pairing_results_url = reverse("pairing_results")
+            ingredient_pks = (
+                Ingredient.objects.filter_with_data()
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+            urls.extend(
+                (
+                    f"{pairing_results_url}?{urlencode({'ingredients': pk})}",
+                    f"{pairing_results_url.strip('/')}/{pk}.html",
+                )
+                for pk in ingredient_pks
+            )
+        return urls
+
+    def write_file(self, path: Path, content: bytes) -> list[str]:
+        """Write a file along with its pre-compressed variants.
+
+        :return: The content encodings that are available.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        variants = get_compressed_variants(content)
+        for encoding, compressed in variants.items():
+            path.with_name(path.name + VARIANT_SUFFIXES[encoding]).write_bytes(
+                compressed
+            )
+        return list(variants)
+
+    def export(self, target: Path, urls: list[tuple[str, str]]) -> dict[str, Any]:
+        client = Client()
+        files = dict[str, Any]()
+        for url, relative_path in urls:
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f"{url} returned status {response.status_code}.")
+            files[url] = {
+                "path": relative_path,
+                "content_type": response["Content-Type"],
+                "etag": response.get("ETag"),
+                "last_modified": response.get("Last-Modified"),
+                "encodings": self.write_file(target / relative_path, response.content),
+            }
+            logging.debug(f"[Static export] exported {url}.")
+        return files
+
+    def switch_current(self, output: Path, name: str) -> None:
+        """Atomically point the 'current' link to a new export and remove old ones."""
+        link = output / "current"
+        temporary_link = output / "current.new"
+        if temporary_link.is_symlink():
+            temporary_link.unlink()
+        temporary_link.symlink_to(name, target_is_directory=True)
+        os.replace(temporary_link, link)
+
+        exports = sorted(
+            (
+                path
+                for path in output.iterdir()
+                if path.name.isdigit() and not path.is_symlink()
+            ),
+            key=lambda path: int(path.name),
+        )
+        for path in exports[: -(KEEP_PREVIOUS_EXPORTS + 1)]:
+            shutil.rmtree(path)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        version = get_current_version()
+        if version is None:
+            raise CommandError("There is no dataset version yet, run sync first.")
+        if brotli is None:
+            logging.warning(
+                "[Static export] the brotli package is not installed, only gzip "
+                "variants are written."
+            )
+
+        output: Path = options["output"]
+        target = output / str(version.pk)
+        temporary_target = output / f"{version.pk}.tmp"
+        if temporary_target.exists():
+            shutil.rmtree(temporary_target)
+        temporary_target.mkdir(parents=True)
+
+        # The test client always uses this host name. Heavy pairing requests must be
+        # calculated right away instead of being queued.
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            PAIRING_JOB_QUEUE=False,
+        ):
+            urls = self.get_urls(options["skip_pairing_reports"])
+            files = self.export(temporary_target, urls)
+
+        manifest = {
+            "version": version.pk,
+            "created_at": version.created_at.isoformat(),
+            "files": files,
+        }
+        with open(temporary_target / "manifest.json", "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+            manifest_file.write("\n")
+
+        if target.exists():
+            shutil.rmtree(target)
+        temporary_target.rename(target)
+        self.switch_current(output, target.name)
+        logging.info(
+            f"[Static export] exported {len(files)} pages of dataset version "
+            f"{version.pk} to {target}."
+        )
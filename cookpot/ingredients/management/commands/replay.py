@@ -0,0 +1,129 @@
+import json
+import logging
+import time
+from collections.abc import Mapping
+from typing import Any
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.urls import reverse
+
+from cookpot.ingredients.benchmarking import (
+    InProcessTarget,
+    format_report,
+    percentile,
+    run_requests,
+)
+from cookpot.ingredients.ranking import RANKING_CACHE
+from cookpot.ingredients.sections import FRAGMENT_CACHE
+
+#: Caches of rendered fragments and calculated rankings, which are disabled during a
+#: replay unless --warm is given. Otherwise, only the first run of a request would
+#: actually do the work that made it slow.
+RESULT_CACHES = (FRAGMENT_CACHE, RANKING_CACHE)
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay requests captured by the slow request middleware against the current "
+        "code and database and report their latency."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "capture_files",
+            nargs="+",
+            type=str,
+            help="Captured JSON lines files (for example data/slow_requests.jsonl).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Number of requests to run at the same time.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=1,
+            help="Number of times each captured request is replayed.",
+        )
+        parser.add_argument(
+            "--warm",
+            action="store_true",
+            help="Keep using the fragment and ranking caches, so that repeated "
+            "requests can be answered from them.",
+        )
+
+    def load_records(self, path: str) -> list[Mapping[str, Any]]:
+        records = list[Mapping[str, Any]]()
+        with open(path, "r") as capture_file:
+            for line_index, line in enumerate(capture_file):
+                try:
+                    record = json.loads(line)
+                    assert isinstance(record, Mapping)
+                    assert isinstance(record.get("view"), str)
+                    assert isinstance(record.get("parameters"), Mapping)
+                    assert isinstance(record.get("latency"), (int, float))
+                    records.append(record)
+                except:
+                    logging.exception(
+                        f"[Replay] {path} line {line_index + 1}: error while "
+                        f"processing."
+                    )
+        return records
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        records = list[Mapping[str, Any]]()
+        for path in options["capture_files"]:
+            records += self.load_records(path)
+        if not records:
+            self.stderr.write("No captured requests found.")
+            return
+
+        requests = [
+            (
+                record["view"],
+                f"{reverse(record['view'])}?{urlencode(record['parameters'])}",
+            )
+            for record in records
+        ] * options["repeat"]
+
+        with InProcessTarget(
+            disabled_caches=() if options["warm"] else RESULT_CACHES
+        ) as target:
+            start = time.perf_counter()
+            samples = run_requests(
+                requests, target, concurrency=options["concurrency"]
+            )
+            duration = time.perf_counter() - start
+
+        for line in format_report(samples, duration):
+            self.stdout.write(line)
+
+        self.stdout.write("")
+        self.stdout.write("Median latency compared to the capture:")
+        for view_name in sorted({record["view"] for record in records}):
+            captured = sorted(
+                record["latency"] * 1000
+                for record in records
+                if record["view"] == view_name
+            )
+            replayed = sorted(
+                sample.latency * 1000
+                for sample in samples
+                if sample.label == view_name
+            )
+            captured_median = percentile(captured, 0.5)
+            replayed_median = percentile(replayed, 0.5)
+            # The ratio is meaningless for empty or instant (rounded to zero)
+            # captures.
+            ratio = (
+                f"{replayed_median / captured_median:.2f}x"
+                if captured_median > 0
+                else "n/a"
+            )
+            self.stdout.write(
+                f"{view_name:<24} {captured_median:>9.1f} ms -> "
+                f"{replayed_median:>9.1f} ms ({ratio})"
+            )
@@ -3,21 +3,43 @@ import logging
 import os
 import re
 import unicodedata
-from collections.abc import Mapping, Sequence
-from typing import Any
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, TypeVar
 
 import requests
+from django import db
 from django.core.cache import caches
 from django.core.management.base import BaseCommand, CommandParser
 from django.db import models, transaction
 from django.db.models import functions
 
+from cookpot.ingredients.dataset import (
+    create_version,
+    get_current_version,
+    publish_version,
+)
+from cookpot.ingredients.flavordb import ENTITY_URL, iter_mirror, parse_entity
 from cookpot.ingredients.models import (
     Ingredient,
     IngredientName,
     Molecule,
     MoleculeOccurrence,
+    PairingJob,
+)
+from cookpot.ingredients.pagerank import (
+    discard_transition_graph,
+    store_transition_graph,
+)
+from cookpot.ingredients.postings import discard_postings_index, store_postings_index
+from cookpot.ingredients.search import get_search_backend
+from cookpot.ingredients.sections import (
+    discard_section_fragments,
+    prewarm_section_fragments,
+    summarize_sections,
 )
+from cookpot.ingredients.vectors import discard_flavor_vectors, prewarm_flavor_vectors
 
 FLAVORDB_CATEGORY_MAPPINGS = {
     "cereal": Ingredient.Category.CEREALS_CEREAL,
@@ -32,6 +54,11 @@ FLAVORDB_CATEGORY_MAPPINGS = {
     "plantderivative": Ingredient.Category.PLANT_DERIVATIVE,
 }
 
+#: Number of FlavorDB entities from a mirror that are parsed and committed together.
+FLAVORDB_BATCH_SIZE = 64
+
+T = TypeVar("T")
+
 FOODB_GROUP_MAPPINGS = {
     ("Animal foods", "Caprae"): Ingredient.Category.MEAT,
     ("Animal foods", "Poultry"): Ingredient.Category.MEAT,
@@ -90,6 +117,12 @@ FOODB_GROUP_MAPPINGS = {
 }
 
 
+def _batched(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
 class Command(BaseCommand):
     help = "Fetch ingredient information from upstream databases."
 
@@ -178,6 +211,22 @@ class Command(BaseCommand):
 
         return created
 
+    def update_ingredient_summaries(self) -> None:
+        """Refresh the denormalized columns on all ingredients in one go."""
+        updated_count = Ingredient.objects.update_summaries()
+        logging.debug(f"[Summaries] updated {updated_count} ingredients.")
+
+    def _import_flavordb_entity(self, entity_id: int, data: Any) -> None:
+        try:
+            if self._handle_flavordb_entity(entity_id, data):
+                logging.info(f"[FlavorDB] Entity {entity_id}: created new record.")
+            else:
+                logging.debug(
+                    f"[FlavorDB] Entity {entity_id}: updated existing record."
+                )
+        except:
+            logging.exception(f"[FlavorDB] Entity {entity_id}: error while processing.")
+
     def sync_flavordb(self) -> None:
         MoleculeOccurrence.objects.update(flavordb_found=False)
 
@@ -187,7 +236,7 @@ class Command(BaseCommand):
             response = caches["default"].get(cache_key, None)
             if response is None:
                 response = session.get(
-                    "https://cosylab.iiitd.edu.in/flavordb/entities_json",
+                    ENTITY_URL,
                     params={"id": entity_id},
                     headers={"Accept": "application/json"},
                 )
@@ -200,16 +249,65 @@ class Command(BaseCommand):
 
             try:
                 response.raise_for_status()
-                if self._handle_flavordb_entity(entity_id, response.json()):
-                    logging.info(f"[FlavorDB] Entity {entity_id}: created new record.")
-                else:
-                    logging.debug(
-                        f"[FlavorDB] Entity {entity_id}: updated existing record."
-                    )
+                data = response.json()
             except:
                 logging.exception(
                     f"[FlavorDB] Entity {entity_id}: error while processing."
                 )
+                continue
+            self._import_flavordb_entity(entity_id, data)
+
+        self.update_ingredient_summaries()
+
+    def _import_flavordb_batch(
+        self, entity_ids: list[int], results: Iterable[tuple[Any, str]]
+    ) -> int:
+        """Write a batch of parsed FlavorDB entities in a single transaction.
+
+        Each entity still has its own savepoint, so errors only discard that entity.
+
+        :return: The number of entities that are known to be missing upstream.
+        """
+        missing_count = 0
+        with transaction.atomic():
+            for entity_id, (data, error) in zip(entity_ids, results):
+                if error:
+                    logging.error(
+                        f"[FlavorDB] Entity {entity_id}: invalid JSON: {error}"
+                    )
+                elif data is None:
+                    missing_count += 1
+                else:
+                    self._import_flavordb_entity(entity_id, data)
+        return missing_count
+
+    def sync_flavordb_mirror(self, flavordb_path: str) -> None:
+        """Import FlavorDB from a local mirror, see :mod:`cookpot.ingredients.flavordb`.
+
+        Files are parsed in worker processes while the previous batch is written.
+        """
+        MoleculeOccurrence.objects.update(flavordb_found=False)
+        # The workers only parse JSON, so they shouldn't inherit database connections.
+        db.connections.close_all()
+
+        entity_count = missing_count = 0
+        with ProcessPoolExecutor() as executor:
+            pending = None
+            for batch in _batched(iter_mirror(flavordb_path), FLAVORDB_BATCH_SIZE):
+                entity_ids = [entity_id for entity_id, _ in batch]
+                results = executor.map(parse_entity, [content for _, content in batch])
+                if pending is not None:
+                    missing_count += self._import_flavordb_batch(*pending)
+                pending = (entity_ids, results)
+                entity_count += len(batch)
+            if pending is not None:
+                missing_count += self._import_flavordb_batch(*pending)
+
+        logging.info(
+            f"[FlavorDB] processed {entity_count - missing_count} entities from the "
+            f"mirror and skipped {missing_count} that are missing upstream."
+        )
+        self.update_ingredient_summaries()
 
     def sync_foodb_ingredients(
         self,
@@ -378,6 +476,7 @@ class Command(BaseCommand):
                     f"processing."
                 )
 
+        self.update_ingredient_summaries()
         return ingredient_foodb_ids
 
     @transaction.atomic
@@ -487,9 +586,16 @@ class Command(BaseCommand):
                     logging.debug(f"[FooDB content] processed {line_index + 1} lines.")
 
         logging.debug(f"[FooDB content] updated {updated_count} entries.")
+        self.update_ingredient_summaries()
 
     def add_arguments(self, parser: CommandParser) -> None:
         parser.add_argument("--foodb-path", nargs="?", type=str)
+        parser.add_argument(
+            "--flavordb-path",
+            type=str,
+            help="Directory or archive with a mirror of the FlavorDB entities, see "
+            "cookpot.ingredients.flavordb.",
+        )
 
     def handle(self, *args: Any, **options: Any) -> None:
         assert isinstance(
@@ -503,6 +609,47 @@ class Command(BaseCommand):
         if foodb_path.endswith("/"):
             foodb_path = foodb_path[:-1]
 
+        if (flavordb_path := options.get("flavordb_path")) is not None:
+            self.sync_flavordb_mirror(flavordb_path)
+        # Without a mirror, FlavorDB could be fetched from the live API instead (or
+        # use the mirrorflavordb command to create a mirror first):
         # self.sync_flavordb()
         ingredient_foodb_ids = self.sync_foodb_ingredients(foodb_path)
         self.sync_foodb_content(foodb_path, ingredient_foodb_ids)
+
+        get_search_backend().rebuild()
+        logging.info("Rebuilt the search index.")
+
+        # Everything that is derived from the dataset is built for the new version
+        # before it is published, so that requests never have to build it on demand.
+        previous_version = get_current_version()
+        version = create_version(
+            sections=summarize_sections(),
+            median_foodb_content=MoleculeOccurrence.objects.get_median_foodb_content(),
+        )
+        logging.info(f"Created dataset version {version.pk}.")
+
+        section_count = prewarm_section_fragments(version)
+        logging.info(f"Prewarmed {section_count} section fragments.")
+
+        prewarm_flavor_vectors(version)
+        logging.info("Prewarmed the flavour vectors.")
+
+        store_postings_index(version)
+        logging.info("Built the molecule postings index.")
+
+        store_transition_graph(version)
+        logging.info("Built the PageRank transition graph.")
+
+        publish_version(version)
+        logging.info(f"Published dataset version {version.pk}.")
+
+        if previous_version is not None:
+            discard_section_fragments(previous_version)
+            discard_flavor_vectors(previous_version)
+            discard_postings_index(previous_version)
+            discard_transition_graph(previous_version)
+            logging.info(f"Discarded cached data of version {previous_version.pk}.")
+
+        deleted_count, _ = PairingJob.objects.exclude(version=version).delete()
+        logging.info(f"Deleted {deleted_count} pairing jobs of previous versions.")
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0010_enable_unaccent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredientname',
+            index=models.Index(fields=['ingredient', 'priority'], include=('label',), name='ingredientname_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moleculeoccurrence',
+            index=models.Index(condition=models.Q(('flavordb_found', True), ('foodb_content_sample_count__gt', 0), _connector='OR'), fields=['ingredient'], name='occurrence_with_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moleculeoccurrence',
+            index=models.Index(fields=['molecule', 'ingredient'], include=('flavordb_found', 'foodb_content_sum', 'foodb_content_sample_count'), name='occurrence_molecule_score_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:46
+
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.migrations.state import StateApps
+from django.db.models import functions
+
+
+def update_summaries(apps: StateApps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    Ingredient = apps.get_model('ingredients', 'Ingredient')
+    IngredientName = apps.get_model('ingredients', 'IngredientName')
+    MoleculeOccurrence = apps.get_model('ingredients', 'MoleculeOccurrence')
+
+    data_occurrences = MoleculeOccurrence.objects.filter(
+        models.Q(flavordb_found=True) | models.Q(foodb_content_sample_count__gt=0),
+        ingredient=models.OuterRef('pk'),
+    )
+    Ingredient.objects.update(
+        has_data=models.Exists(data_occurrences),
+        molecule_count=functions.Coalesce(
+            models.Subquery(
+                data_occurrences.order_by().values('ingredient').annotate(count=models.Count('pk')).values('count')
+            ),
+            models.Value(0),
+        ),
+        primary_name=functions.Coalesce(
+            models.Subquery(
+                IngredientName.objects.filter(ingredient=models.OuterRef('pk')).order_by('priority').values('label')[:1]
+            ),
+            models.Value(''),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0011_occurrence_and_name_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='has_data',
+            field=models.BooleanField(db_index=True, default=False, editable=False, help_text='Whether any molecule data is available for this ingredient.', verbose_name='has data'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='molecule_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, help_text='Number of molecules with data found in this ingredient.', verbose_name='molecule count'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='primary_name',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, help_text='Label of the highest-priority name of this ingredient.', max_length=100, verbose_name='primary name'),
+        ),
+        migrations.RunPython(update_summaries, migrations.RunPython.noop),
+    ]
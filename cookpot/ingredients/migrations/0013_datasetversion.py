@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:48
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0012_ingredient_summaries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='creation time')),
+            ],
+            options={
+                'verbose_name': 'dataset version',
+                'verbose_name_plural': 'dataset versions',
+                'get_latest_by': 'pk',
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+import sqlite3
+import unicodedata
+
+from django.db import migrations
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.migrations.state import StateApps
+
+#: The FTS5 trigram tokenizer needs at least this SQLite version. Older versions use
+#: the in-memory n-gram search backend instead, see cookpot.ingredients.search.
+SQLITE_TRIGRAM_VERSION = (3, 34, 0)
+
+
+def fold(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(
+        character for character in decomposed if not unicodedata.combining(character)
+    ).casefold()
+
+
+def create_search_index(
+    apps: StateApps, schema_editor: BaseDatabaseSchemaEditor
+) -> None:
+    IngredientName = apps.get_model("ingredients", "IngredientName")
+    connection = schema_editor.connection
+
+    if connection.vendor == "sqlite":
+        if sqlite3.sqlite_version_info < SQLITE_TRIGRAM_VERSION:
+            return
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE ingredients_search_fts "
+            "USING fts5(label, ingredient_id UNINDEXED, tokenize='trigram')"
+        )
+        table_name = "ingredients_search_fts"
+    elif connection.vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE TABLE ingredients_search_trigram ("
+            "ingredient_id bigint NOT NULL "
+            "REFERENCES ingredients_ingredient (id) ON DELETE CASCADE "
+            "DEFERRABLE INITIALLY DEFERRED, "
+            "label varchar(100) NOT NULL"
+            ")"
+        )
+        schema_editor.execute(
+            "CREATE INDEX ingredients_search_trigram_label_idx "
+            "ON ingredients_search_trigram USING gin (label gin_trgm_ops)"
+        )
+        table_name = "ingredients_search_trigram"
+    else:
+        return
+
+    entries = [
+        (ingredient_id, fold(label))
+        for ingredient_id, label in IngredientName.objects.filter(
+            ingredient__has_data=True
+        ).values_list("ingredient_id", "label")
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table_name} (ingredient_id, label) VALUES (%s, %s)",
+            entries,
+        )
+
+
+def drop_search_index(
+    apps: StateApps, schema_editor: BaseDatabaseSchemaEditor
+) -> None:
+    connection = schema_editor.connection
+    if connection.vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS ingredients_search_fts")
+    elif connection.vendor == "postgresql":
+        schema_editor.execute("DROP TABLE IF EXISTS ingredients_search_trigram")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ingredients", "0013_datasetversion"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
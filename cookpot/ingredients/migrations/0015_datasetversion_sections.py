@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0014_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasetversion',
+            name='sections',
+            field=models.JSONField(default=list, help_text='Summary of the sections (top-level categories) in this version, along with the number of data-bearing ingredients in each category.', verbose_name='sections'),
+        ),
+    ]
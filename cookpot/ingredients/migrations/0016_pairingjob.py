@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0015_datasetversion_sections'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PairingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('selection', models.CharField(help_text='Sorted, comma-separated IDs of the selected ingredients.', max_length=200, verbose_name='selection')),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('running', 'running'), ('done', 'done'), ('failed', 'failed')], default='pending', max_length=7, verbose_name='status')),
+                ('result', models.TextField(blank=True, default='', help_text='Rendered pairing report, once the job is done.', verbose_name='result')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='creation time')),
+                ('started_at', models.DateTimeField(blank=True, default=None, null=True, verbose_name='start time')),
+                ('finished_at', models.DateTimeField(blank=True, default=None, null=True, verbose_name='finish time')),
+                ('version', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pairing_jobs', related_query_name='pairing_job', to='ingredients.datasetversion', verbose_name='dataset version')),
+            ],
+            options={
+                'verbose_name': 'pairing job',
+                'verbose_name_plural': 'pairing jobs',
+                'indexes': [models.Index(fields=['version', 'status', 'created_at'], name='pairing_job_queue_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pairingjob',
+            constraint=models.UniqueConstraint(fields=('version', 'selection'), name='pairing_job_selection_unique'),
+        ),
+    ]
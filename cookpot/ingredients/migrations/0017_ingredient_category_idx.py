@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0016_pairingjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['has_data', 'category'], name='ingredient_category_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:02
+
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.migrations.state import StateApps
+
+
+def publish_existing_versions(apps: StateApps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    # Versions were announced as soon as they were created.
+    DatasetVersion = apps.get_model('ingredients', 'DatasetVersion')
+    DatasetVersion.objects.update(published_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0017_ingredient_category_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasetversion',
+            name='published_at',
+            field=models.DateTimeField(blank=True, help_text='Time when this version became the current one. Until then, derived data for the version is being built.', null=True, verbose_name='publication time'),
+        ),
+        migrations.RunPython(publish_existing_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0018_datasetversion_published_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasetversion',
+            name='median_foodb_content',
+            field=models.FloatField(blank=True, help_text='Score of molecule occurrences that are only known from FlavorDB, see MoleculeOccurrenceQuerySet.get_median_foodb_content().', null=True, verbose_name='median FooDB content'),
+        ),
+    ]
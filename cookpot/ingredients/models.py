@@ -1,33 +1,65 @@
 from __future__ import annotations
 
+from collections.abc import Iterable
+from typing import Optional
+
 from django.core import validators
-from django.db import models
-from django.db.models import expressions
+from django.db import connection, models
+from django.db.models import expressions, functions
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
 class IngredientQuerySet(models.QuerySet["Ingredient"]):
     def annotate_display_name(self) -> IngredientQuerySet:
         """Annotate a ``display_name`` property that contains the name of the ingredient
-        that should be dispalyed to the user."""
-        return self.annotate(
-            display_name=IngredientName.objects.filter(
-                ingredient=models.OuterRef("pk")
-            ).values("label")[:1]
-        )
+        that should be dispalyed to the user.
+
+        This reads the denormalized :attr:`Ingredient.primary_name` column, see
+        :meth:`update_summaries`.
+        """
+        return self.annotate(display_name=models.F("primary_name"))
 
     def filter_with_data(self) -> IngredientQuerySet:
-        """Filter out objects that don't have any molecule data (yet)."""
-        return self.filter(
-            models.Exists(
-                MoleculeOccurrence.objects.filter(
-                    (
-                        models.Q(flavordb_found=True)
-                        | models.Q(foodb_content_sample_count__gt=0)
-                    ),
-                    ingredient=models.OuterRef("pk"),
-                )
-            )
+        """Filter out objects that don't have any molecule data (yet).
+
+        This reads the denormalized :attr:`Ingredient.has_data` column, see
+        :meth:`update_summaries`.
+        """
+        return self.filter(has_data=True)
+
+    def update_summaries(self) -> int:
+        """Recalculate the denormalized ``has_data``, ``molecule_count`` and
+        ``primary_name`` columns in bulk.
+
+        This must be called whenever names or molecule occurrences change, which is
+        normally at the end of each phase of the ``sync`` command.
+
+        :return: The number of updated ingredients.
+        """
+        data_occurrences = MoleculeOccurrence.objects.filter(
+            models.Q(flavordb_found=True) | models.Q(foodb_content_sample_count__gt=0),
+            ingredient=models.OuterRef("pk"),
+        )
+        return self.update(
+            has_data=models.Exists(data_occurrences),
+            molecule_count=functions.Coalesce(
+                models.Subquery(
+                    data_occurrences.order_by()
+                    .values("ingredient")
+                    .annotate(count=models.Count("pk"))
+                    .values("count")
+                ),
+                models.Value(0),
+            ),
+            primary_name=functions.Coalesce(
+                models.Subquery(
+                    IngredientName.objects.filter(
+                        ingredient=models.OuterRef("pk")
+                    ).values("label")[:1]
+                ),
+                models.Value(""),
+            ),
         )
 
 
@@ -92,6 +124,19 @@ class Ingredient(models.Model):
                     return label
             return category_key
 
+        @classmethod
+        def expand(cls, prefixes: Iterable[str]) -> set[str]:
+            """Return all categories that are one of the given ones or below them.
+
+            For example, ``fruit`` expands to ``fruit`` and all ``fruit-*`` categories.
+            """
+            return {
+                category_key
+                for category_key in cls.values
+                for prefix in prefixes
+                if category_key == prefix or category_key.startswith(f"{prefix}-")
+            }
+
     category = models.CharField(
         max_length=30,
         # choices=Category.choices,
@@ -128,6 +173,35 @@ class Ingredient(models.Model):
         help_text=_("Title of the corresponding article in the English Wikipedia."),
     )
 
+    # The following fields are denormalized from the related names and molecule
+    # occurrences. They are kept up to date by IngredientQuerySet.update_summaries().
+
+    has_data = models.BooleanField(
+        default=False,
+        db_index=True,
+        editable=False,
+        verbose_name=_("has data"),
+        help_text=_("Whether any molecule data is available for this ingredient."),
+    )
+
+    molecule_count = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        editable=False,
+        verbose_name=_("molecule count"),
+        help_text=_("Number of molecules with data found in this ingredient."),
+    )
+
+    primary_name = models.CharField(
+        max_length=100,
+        blank=True,
+        default="",
+        db_index=True,
+        editable=False,
+        verbose_name=_("primary name"),
+        help_text=_("Label of the highest-priority name of this ingredient."),
+    )
+
     objects = IngredientManager()
 
     class Meta:
@@ -143,6 +217,12 @@ class Ingredient(models.Model):
                 name="foodb_food_ids_unique",
             ),
         ]
+        indexes = [
+            # Used when pairing suggestions are restricted to some categories.
+            models.Index(
+                fields=["has_data", "category"], name="ingredient_category_idx"
+            ),
+        ]
         verbose_name = _("ingredient")
         verbose_name_plural = _("ingredients")
 
@@ -178,6 +258,16 @@ class IngredientName(models.Model):
     )
 
     class Meta:
+        indexes = [
+            # Covers the correlated lookup of the primary name in
+            # IngredientQuerySet.update_summaries(), which only needs the label of
+            # the first name of each ingredient.
+            models.Index(
+                fields=["ingredient", "priority"],
+                include=["label"],
+                name="ingredientname_priority_idx",
+            ),
+        ]
         ordering = ["ingredient", "priority"]
         verbose_name = _("ingredient name")
         verbose_name_plural = _("ingredient names")
@@ -231,15 +321,8 @@ class Molecule(models.Model):
 
 
 class MoleculeOccurrenceQuerySet(models.QuerySet["MoleculeOccurrence"]):
-    def with_score(self, *, filter_zero: bool = True) -> MoleculeOccurrenceQuerySet:
-        """Annotate a ``score`` value on each occurrence object.
-
-        This is a float which more or less states the amount the molecule is present in
-        the ingredient, in milligram per 100 gramms of ingredient.
-
-        :param filter_zero: Setting this to ``True`` (the default) will filter out
-            results with a score of zero.
-        """
+    @staticmethod
+    def _get_median_foodb_content_sql() -> expressions.RawSQL:
         # Calculate the median of all FooDB content values. We use this as the constant
         # score value for ingredients from FlavorDB, because the relation is only binary
         # in that source.
@@ -252,7 +335,7 @@ class MoleculeOccurrenceQuerySet(models.QuerySet["MoleculeOccurrence"]):
             foodb_contents_sql,
             foodb_contents_params,
         ) = foodb_contents.query.sql_with_params()
-        median_foodb_content = expressions.RawSQL(
+        return expressions.RawSQL(
             f"""
             WITH scores AS ({foodb_contents_sql})
 
@@ -264,6 +347,37 @@ class MoleculeOccurrenceQuerySet(models.QuerySet["MoleculeOccurrence"]):
             foodb_contents_params,
         )
 
+    def get_median_foodb_content(self) -> Optional[float]:
+        """Return the score that FlavorDB records get in :meth:`with_score`.
+
+        This reads the whole table, so it is calculated once per dataset version and
+        stored in :attr:`DatasetVersion.median_foodb_content`.
+        """
+        median_foodb_content = self._get_median_foodb_content_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT ({median_foodb_content.sql})", median_foodb_content.params
+            )
+            (value,) = cursor.fetchone()
+        return value
+
+    def with_score(
+        self,
+        *,
+        filter_zero: bool = True,
+        median_foodb_content: Optional[float] = None,
+    ) -> MoleculeOccurrenceQuerySet:
+        """Annotate a ``score`` value on each occurrence object.
+
+        This is a float which more or less states the amount the molecule is present in
+        the ingredient, in milligram per 100 gramms of ingredient.
+
+        :param filter_zero: Setting this to ``True`` (the default) will filter out
+            results with a score of zero.
+        :param median_foodb_content: The result of :meth:`get_median_foodb_content`,
+            if it is already known. Otherwise, it is calculated in a subquery, which
+            needs to read all occurrences.
+        """
         queryset = self.annotate(
             score=models.Case(
                 # Prefer data from FooDB, if it is available.
@@ -279,7 +393,11 @@ class MoleculeOccurrenceQuerySet(models.QuerySet["MoleculeOccurrence"]):
                 # value.
                 models.When(
                     models.Q(flavordb_found=True),
-                    then=median_foodb_content,
+                    then=(
+                        self._get_median_foodb_content_sql()
+                        if median_foodb_content is None
+                        else models.Value(median_foodb_content)
+                    ),
                 ),
                 # This case shouldn't actually every occur, because wo only create
                 # MoleculeOccurrence objects when we have data.
@@ -350,5 +468,150 @@ class MoleculeOccurrence(models.Model):
                 fields=["ingredient", "molecule"], name="ingredient_molecule_unique"
             )
         ]
+        indexes = [
+            # Used by IngredientQuerySet.update_summaries() to find the occurrences
+            # that actually carry data, once per ingredient. Other queries read the
+            # denormalized Ingredient.has_data instead.
+            models.Index(
+                fields=["ingredient"],
+                condition=(
+                    models.Q(flavordb_found=True)
+                    | models.Q(foodb_content_sample_count__gt=0)
+                ),
+                name="occurrence_with_data_idx",
+            ),
+            # Lets the pairing queries join occurrences by molecule and compute scores
+            # without visiting the table.
+            models.Index(
+                fields=["molecule", "ingredient"],
+                include=[
+                    "flavordb_found",
+                    "foodb_content_sum",
+                    "foodb_content_sample_count",
+                ],
+                name="occurrence_molecule_score_idx",
+            ),
+        ]
         verbose_name = _("ingredient molecule containment")
         verbose_name_plural = _("ingredient molecule containments")
+
+
+class DatasetVersion(models.Model):
+    """A version of the ingredient dataset.
+
+    A new version is created every time the ``sync`` command finishes. Everything that
+    is derived from the dataset (like HTTP responses) may be cached until the version
+    changes.
+    """
+
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name=_("creation time"),
+    )
+
+    published_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name=_("publication time"),
+        help_text=_(
+            "Time when this version became the current one. Until then, derived data "
+            "for the version is being built."
+        ),
+    )
+
+    sections = models.JSONField(
+        default=list,
+        verbose_name=_("sections"),
+        help_text=_(
+            "Summary of the sections (top-level categories) in this version, along "
+            "with the number of data-bearing ingredients in each category."
+        ),
+    )
+
+    median_foodb_content = models.FloatField(
+        blank=True,
+        null=True,
+        verbose_name=_("median FooDB content"),
+        help_text=_(
+            "Score of molecule occurrences that are only known from FlavorDB, see "
+            "MoleculeOccurrenceQuerySet.get_median_foodb_content()."
+        ),
+    )
+
+    class Meta:
+        get_latest_by = "pk"
+        verbose_name = _("dataset version")
+        verbose_name_plural = _("dataset versions")
+
+
+class PairingJob(models.Model):
+    """A pairing report that is calculated in the background.
+
+    Jobs are processed by the ``pairingworker`` command. There is at most one job per
+    selection and dataset version, which also stores the finished report.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", _("pending")
+        RUNNING = "running", _("running")
+        DONE = "done", _("done")
+        FAILED = "failed", _("failed")
+
+    version = models.ForeignKey(
+        DatasetVersion,
+        on_delete=models.CASCADE,
+        related_name="pairing_jobs",
+        related_query_name="pairing_job",
+        verbose_name=_("dataset version"),
+    )
+    selection = models.CharField(
+        max_length=200,
+        verbose_name=_("selection"),
+        help_text=_("Sorted, comma-separated IDs of the selected ingredients."),
+    )
+
+    status = models.CharField(
+        max_length=7,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name=_("status"),
+    )
+    result = models.TextField(
+        blank=True,
+        default="",
+        verbose_name=_("result"),
+        help_text=_("Rendered pairing report, once the job is done."),
+    )
+
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name=_("creation time"),
+    )
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        default=None,
+        verbose_name=_("start time"),
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        default=None,
+        verbose_name=_("finish time"),
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["version", "selection"], name="pairing_job_selection_unique"
+            )
+        ]
+        indexes = [
+            # Used by workers to find the next job.
+            models.Index(
+                fields=["version", "status", "created_at"],
+                name="pairing_job_queue_idx",
+            ),
+        ]
+        verbose_name = _("pairing job")
+        verbose_name_plural = _("pairing jobs")
@@ -0,0 +1,188 @@
+"""Suggestions from a random walk over the ingredient–molecule graph.
+
+Ingredients and molecules form a bipartite graph, where each molecule occurrence is an
+edge that is weighted by its score. Personalised PageRank (a random walk with restart)
+starts at the selected ingredients, walks from an ingredient to one of its molecules
+and from there to another ingredient containing that molecule, and jumps back to the
+selection with a fixed probability in each step. Ingredients where the walk spends a
+lot of time are good suggestions. Unlike the shared molecule scoring in
+:meth:`~cookpot.ingredients.views.PairingResultsView.calculate_suggested_ingredients`,
+this also finds ingredients that are only connected through other ingredients.
+
+The ``sync`` command builds the (sparse) transition matrices for each new dataset
+version and stores them in the same cache as the postings index. Each process then
+loads them once per version, so ranking a selection doesn't need the database.
+"""
+from __future__ import annotations
+
+from collections.abc import Collection, Sequence
+from typing import Optional
+
+import numpy as np
+from django.core.cache import caches
+from django.db import models
+from scipy import sparse  # type: ignore[import]
+
+from .dataset import VersionedValue, get_current_version
+from .models import DatasetVersion, Ingredient, MoleculeOccurrence
+from .postings import INDEX_CACHE
+from .ranking import Ranking
+
+CACHE_KEY = "pagerank"
+
+#: Probability that the walk jumps back to the selected ingredients in each step.
+RESTART_PROBABILITY = 0.15
+
+#: The iteration stops once the distribution changes less than this (in L1 norm).
+TOLERANCE = 1e-6
+
+#: Upper bound for the number of iterations.
+MAX_ITERATIONS = 100
+
+
+def _normalize_rows(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    """Scale the rows of a matrix so that each of them adds up to one."""
+    row_sums = np.asarray(matrix.sum(axis=1)).ravel()
+    row_sums[row_sums == 0] = 1.0
+    return sparse.diags(1.0 / row_sums) @ matrix
+
+
+class TransitionGraph:
+    def __init__(
+        self,
+        ingredient_ids: np.ndarray,
+        ingredient_categories: np.ndarray,
+        to_molecules: sparse.csr_matrix,
+        to_ingredients: sparse.csr_matrix,
+    ):
+        #: Sorted IDs of the ingredients in the graph, in the order of the matrices.
+        self.ingredient_ids = ingredient_ids
+        #: Category of each ingredient, used to restrict suggestions.
+        self.ingredient_categories = ingredient_categories
+        #: Transposed transition matrix from ingredients to molecules. Multiplying it
+        #: with a distribution over ingredients gives one over molecules.
+        self.to_molecules = to_molecules
+        #: Transposed transition matrix from molecules back to ingredients.
+        self.to_ingredients = to_ingredients
+
+    @classmethod
+    def from_database(cls) -> TransitionGraph:
+        ingredient_ids = list[int]()
+        molecule_ids = list[int]()
+        scores = list[float]()
+        for ingredient_id, molecule_id, score in (
+            MoleculeOccurrence.objects.with_score()
+            .filter(
+                models.Q(foodb_content_sample_count__gt=0)
+                | models.Q(flavordb_found=True)
+            )
+            .values_list("ingredient_id", "molecule_id", "score")
+            .iterator()
+        ):
+            ingredient_ids.append(ingredient_id)
+            molecule_ids.append(molecule_id)
+            scores.append(score)
+
+        unique_ingredient_ids, ingredient_indices = np.unique(
+            np.array(ingredient_ids, dtype=np.int64), return_inverse=True
+        )
+        unique_molecule_ids, molecule_indices = np.unique(
+            np.array(molecule_ids, dtype=np.int64), return_inverse=True
+        )
+        weights = sparse.csr_matrix(
+            (
+                np.array(scores, dtype=np.float64),
+                (ingredient_indices, molecule_indices),
+            ),
+            shape=(len(unique_ingredient_ids), len(unique_molecule_ids)),
+        )
+        categories = dict(Ingredient.objects.values_list("pk", "category").iterator())
+        return cls(
+            unique_ingredient_ids,
+            np.array(
+                [categories.get(pk, "") for pk in unique_ingredient_ids.tolist()],
+                dtype=object,
+            ),
+            _normalize_rows(weights).T.tocsr(),
+            _normalize_rows(weights.T.tocsr()).T.tocsr(),
+        )
+
+    def rank(
+        self,
+        ingredient_pks: Sequence[int],
+        categories: Optional[Collection[str]] = None,
+    ) -> Ranking:
+        """Rank all other ingredients in the graph for a selection.
+
+        :param categories: If given, only ingredients in these categories are ranked.
+            They still take part in the random walk.
+        :return: The ranking, with scores scaled so that the best suggestion has a
+            score of one.
+        """
+        indices = np.searchsorted(self.ingredient_ids, ingredient_pks)
+        indices = indices[indices < len(self.ingredient_ids)]
+        indices = np.unique(
+            indices[np.isin(self.ingredient_ids[indices], ingredient_pks)]
+        )
+        if len(indices) == 0:
+            return []
+
+        restart = np.zeros(len(self.ingredient_ids))
+        restart[indices] = 1.0 / len(indices)
+        distribution = restart
+        for _ in range(MAX_ITERATIONS):
+            next_distribution = (1 - RESTART_PROBABILITY) * (
+                self.to_ingredients @ (self.to_molecules @ distribution)
+            ) + RESTART_PROBABILITY * restart
+            change = np.abs(next_distribution - distribution).sum()
+            distribution = next_distribution
+            if change < TOLERANCE:
+                break
+
+        candidates = np.ones(len(self.ingredient_ids), dtype=bool)
+        candidates[indices] = False
+        if categories is not None:
+            candidates &= np.isin(self.ingredient_categories, list(categories))
+        candidate_ids = self.ingredient_ids[candidates]
+        candidate_scores = distribution[candidates]
+        max_score = candidate_scores.max(initial=0.0)
+        if max_score > 0:
+            candidate_scores = candidate_scores / max_score
+        # Ties are broken by the ID, like in the shared molecule ranking.
+        order = np.lexsort((-candidate_ids, -candidate_scores))
+        return list(
+            zip(candidate_ids[order].tolist(), candidate_scores[order].tolist())
+        )
+
+
+def store_transition_graph(version: DatasetVersion) -> TransitionGraph:
+    """Build the graph for a new dataset version and store it in the cache."""
+    graph = TransitionGraph.from_database()
+    caches[INDEX_CACHE].set(CACHE_KEY, graph, None, version=version.pk)
+    return graph
+
+
+def discard_transition_graph(version: DatasetVersion) -> None:
+    """Remove the graph of a previous dataset version from the cache."""
+    caches[INDEX_CACHE].delete(CACHE_KEY, version=version.pk)
+
+
+def _load_transition_graph() -> TransitionGraph:
+    version = get_current_version()
+    if version is None:
+        return TransitionGraph.from_database()
+    graph = caches[INDEX_CACHE].get(CACHE_KEY, version=version.pk)
+    if graph is None:
+        graph = store_transition_graph(version)
+    assert isinstance(graph, TransitionGraph)
+    return graph
+
+
+_transition_graph = VersionedValue(_load_transition_graph)
+
+
+def rank_by_pagerank(
+    ingredient_pks: Sequence[int], categories: Optional[Collection[str]] = None
+) -> Ranking:
+    """Rank suggestions for a selection using the graph of the current dataset."""
+    return _transition_graph.get().rank(ingredient_pks, categories)
@@ -0,0 +1,65 @@
+"""Blocked calculation of the weighted score of every ingredient pair.
+
+When a single ingredient is selected, the weighted score of a candidate (see
+:meth:`~cookpot.ingredients.views.PairingResultsView.calculate_suggested_ingredients`)
+is the sum of the selected ingredient's scores for all molecules that the candidate
+contains, divided by the largest of these scores. For all pairs at once, that is the
+product of the row-normalized score matrix and the transposed occurrence matrix.
+
+The product is calculated in tiles, so that memory stays bounded no matter how many
+ingredients there are, and tiles can be spread over worker processes. This module
+doesn't use Django, so that it can be imported by the workers.
+"""
+from typing import Optional
+
+import numpy as np
+from scipy import sparse  # type: ignore[import]
+
+#: A tile of the result: row indices, column indices and scores of its non-zero pairs.
+Tile = tuple[np.ndarray, np.ndarray, np.ndarray]
+
+_scores: Optional[sparse.csr_matrix] = None
+_occurrences: Optional[sparse.csr_matrix] = None
+
+
+def normalize_scores(scores: sparse.csr_matrix) -> sparse.csr_matrix:
+    """Divide each row of a score matrix by its largest value."""
+    max_scores = scores.max(axis=1).toarray().ravel()
+    max_scores[max_scores == 0] = 1.0
+    return sparse.diags(1.0 / max_scores) @ scores
+
+
+def init_worker(scores: sparse.csr_matrix, occurrences: sparse.csr_matrix) -> None:
+    """Set the matrices that :func:`calculate_tile` works on.
+
+    :param scores: Row-normalized scores, with one row per ingredient and one column
+        per molecule.
+    :param occurrences: Matrix of the same shape that is one wherever the ingredient
+        contains the molecule at all.
+    """
+    global _scores, _occurrences
+    _scores = scores
+    _occurrences = occurrences
+
+
+def calculate_tile(
+    row_range: tuple[int, int], column_range: tuple[int, int], threshold: float
+) -> Tile:
+    """Calculate the pair scores of a tile.
+
+    Pairs of an ingredient with itself and those with a score of zero or below the
+    threshold are left out. The result is sorted by row and then column.
+    """
+    assert _scores is not None and _occurrences is not None
+    row_start, row_end = row_range
+    column_start, column_end = column_range
+    tile = (
+        _scores[row_start:row_end] @ _occurrences[column_start:column_end].T
+    ).tocoo()
+
+    rows = tile.row.astype(np.int64) + row_start
+    columns = tile.col.astype(np.int64) + column_start
+    mask = (tile.data > 0) & (tile.data >= threshold) & (rows != columns)
+    rows, columns, scores = rows[mask], columns[mask], tile.data[mask]
+    order = np.lexsort((columns, rows))
+    return rows[order], columns[order], scores[order]
@@ -0,0 +1,158 @@
+"""Inverted index from molecules to the ingredients that contain them.
+
+For each molecule, the index has a postings list of ingredient IDs (sorted, so they can
+be searched with binary search) and the score of the molecule in each ingredient. This
+is enough to explain pairing suggestions without touching the database: the
+contribution of a molecule to a suggestion is calculated the same way as in
+:meth:`~cookpot.ingredients.views.PairingResultsView.calculate_suggested_ingredients`.
+A forward map from each ingredient to its molecules limits an explanation to the
+molecules of the ingredients involved.
+
+The ``sync`` command builds the index for each new dataset version and stores it in a
+shared cache. Each process then loads it once per version.
+"""
+from __future__ import annotations
+
+import bisect
+from array import array
+from collections.abc import Sequence
+from typing import NamedTuple, Optional
+
+from django.core.cache import caches
+
+from .dataset import VersionedValue, get_current_version
+from .models import DatasetVersion, Molecule, MoleculeOccurrence
+
+#: Name of the cache that the index is stored in.
+INDEX_CACHE = "indexes"
+
+#: This changes whenever the stored structure does, so that indexes which were
+#: pickled by an older version are not loaded.
+CACHE_KEY = "postings_2"
+
+
+class Contribution(NamedTuple):
+    molecule_id: int
+    pubchem_id: Optional[int]
+    foodb_id: str
+    #: Share of the suggestion's weighted score that this molecule is responsible for.
+    score: float
+
+
+class PostingsIndex:
+    def __init__(
+        self,
+        postings: dict[int, tuple[array[int], array[float]]],
+        molecules: dict[int, array[int]],
+        molecule_identifiers: dict[int, tuple[Optional[int], str]],
+    ):
+        self.postings = postings
+        #: Sorted IDs of the molecules that each ingredient contains.
+        self.molecules = molecules
+        self.molecule_identifiers = molecule_identifiers
+
+    @classmethod
+    def from_database(cls) -> PostingsIndex:
+        postings: dict[int, tuple[array[int], array[float]]] = {}
+        molecules: dict[int, array[int]] = {}
+        for molecule_id, ingredient_id, score in (
+            MoleculeOccurrence.objects.with_score(filter_zero=False)
+            .order_by("molecule_id", "ingredient_id")
+            .values_list("molecule_id", "ingredient_id", "score")
+            .iterator()
+        ):
+            ingredient_ids, scores = postings.setdefault(
+                molecule_id, (array("q"), array("d"))
+            )
+            ingredient_ids.append(ingredient_id)
+            scores.append(score or 0.0)
+            molecules.setdefault(ingredient_id, array("q")).append(molecule_id)
+
+        molecule_identifiers = {
+            molecule_id: (pubchem_id, foodb_id)
+            for molecule_id, pubchem_id, foodb_id in Molecule.objects.values_list(
+                "pk", "pubchem_id", "foodb_id"
+            ).iterator()
+            if molecule_id in postings
+        }
+        return cls(postings, molecules, molecule_identifiers)
+
+    def explain(
+        self, ingredient_pks: Sequence[int], candidate_pk: int
+    ) -> list[Contribution]:
+        """Find the molecules that a candidate shares with a selection of ingredients.
+
+        :return: The contribution of each shared molecule, largest first. The scores of
+            all contributions add up to the weighted score of the candidate.
+        """
+        selected_pks = set(ingredient_pks)
+        max_total_score = 0.0
+        shared_molecules = list[tuple[int, float]]()
+
+        # Only molecules of the selection have a score, so the others can neither be
+        # shared nor affect the maximum.
+        selected_molecule_ids = set[int]()
+        for ingredient_pk in selected_pks:
+            selected_molecule_ids.update(self.molecules.get(ingredient_pk, ()))
+        candidate_molecule_ids = set(self.molecules.get(candidate_pk, ()))
+
+        for molecule_id in sorted(selected_molecule_ids):
+            ingredient_ids, scores = self.postings[molecule_id]
+            total_score = 0.0
+            for ingredient_pk in selected_pks:
+                index = bisect.bisect_left(ingredient_ids, ingredient_pk)
+                if (
+                    index < len(ingredient_ids)
+                    and ingredient_ids[index] == ingredient_pk
+                    and scores[index] > 0
+                ):
+                    total_score += scores[index]
+            if total_score == 0:
+                continue
+            max_total_score = max(max_total_score, total_score)
+            if molecule_id in candidate_molecule_ids:
+                shared_molecules.append((molecule_id, total_score))
+
+        contributions = [
+            Contribution(
+                molecule_id,
+                *self.molecule_identifiers.get(molecule_id, (None, "")),
+                total_score / max_total_score,
+            )
+            for molecule_id, total_score in shared_molecules
+        ]
+        contributions.sort(key=lambda contribution: -contribution.score)
+        return contributions
+
+
+def store_postings_index(version: DatasetVersion) -> PostingsIndex:
+    """Build the index for a new dataset version and store it in the cache."""
+    postings_index = PostingsIndex.from_database()
+    caches[INDEX_CACHE].set(CACHE_KEY, postings_index, None, version=version.pk)
+    return postings_index
+
+
+def discard_postings_index(version: DatasetVersion) -> None:
+    """Remove the index of a previous dataset version from the cache."""
+    caches[INDEX_CACHE].delete(CACHE_KEY, version=version.pk)
+
+
+def _load_postings_index() -> PostingsIndex:
+    version = get_current_version()
+    if version is None:
+        return PostingsIndex.from_database()
+    postings_index = caches[INDEX_CACHE].get(CACHE_KEY, version=version.pk)
+    if postings_index is None:
+        postings_index = store_postings_index(version)
+    assert isinstance(postings_index, PostingsIndex)
+    return postings_index
+
+
+_postings_index = VersionedValue(_load_postings_index)
+
+
+def explain_pairing(
+    ingredient_pks: Sequence[int], candidate_pk: int
+) -> list[Contribution]:
+    """Explain a suggestion using the index of the current dataset."""
+    return _postings_index.get().explain(ingredient_pks, candidate_pk)
@@ -0,0 +1,203 @@
+"""Cached suggestion rankings for paging through pairing results.
+
+Ranking all candidate ingredients for a selection is the expensive part of a pairing
+request. The ranked IDs and scores (and the matching score of the selection) are
+therefore kept for a short while, keyed by the selection and the dataset version.
+Further pages are then read from the ranking and only the ingredients on that page are
+loaded from the database. Pages are addressed by a :class:`Cursor`, which stays valid
+when the ranking has to be calculated again, as long as the dataset is the same.
+
+Concurrent requests for the same selection share a single calculation, see
+:class:`~cookpot.ingredients.concurrency.SingleFlight`.
+"""
+import base64
+import hashlib
+from collections.abc import Callable, Iterable
+from typing import NamedTuple, Optional, TypeVar
+
+from django.core.cache import caches
+
+from .concurrency import SingleFlight
+from .dataset import get_current_version
+from .models import Ingredient
+
+#: Name of the cache that rankings are stored in.
+RANKING_CACHE = "rankings"
+
+#: A ranking is a list of ingredient IDs and their scores, best matches first.
+Ranking = list[tuple[int, float]]
+
+#: Ways to rank suggestions. The first one is the default, see
+#: :mod:`cookpot.ingredients.pagerank` for the second.
+RANKING_MODES = ("shared_molecules", "pagerank")
+
+T = TypeVar("T")
+
+_single_flight = SingleFlight(RANKING_CACHE)
+
+
+class RankingOptions(NamedTuple):
+    """Options of a pairing request that change which suggestions are ranked how."""
+
+    mode: str = RANKING_MODES[0]
+    #: Category prefixes that suggestions must be in. If this is empty, all categories
+    #: are included.
+    include: tuple[str, ...] = ()
+    #: Category prefixes that suggestions must not be in.
+    exclude: tuple[str, ...] = ()
+
+    @property
+    def categories(self) -> Optional[frozenset[str]]:
+        """The categories that suggestions may be in, or ``None`` for all of them."""
+        if not self.include and not self.exclude:
+            return None
+        categories = (
+            Ingredient.Category.expand(self.include)
+            if self.include
+            else set(Ingredient.Category.values)
+        )
+        return frozenset(categories - Ingredient.Category.expand(self.exclude))
+
+    @property
+    def cache_name(self) -> str:
+        """Name of the cached ranking for these options."""
+        name = "ranking" if self.mode == RANKING_MODES[0] else f"ranking_{self.mode}"
+        categories = self.categories
+        if categories is not None:
+            digest = hashlib.sha256(",".join(sorted(categories)).encode()).hexdigest()
+            name += f"_{digest[:16]}"
+        return name
+
+    def get_parameters(self) -> dict[str, str]:
+        """Return the query parameters that select these options."""
+        parameters = dict[str, str]()
+        if self.mode != RANKING_MODES[0]:
+            parameters["ranking"] = self.mode
+        if self.include:
+            parameters["include"] = ",".join(self.include)
+        if self.exclude:
+            parameters["exclude"] = ",".join(self.exclude)
+        return parameters
+
+
+def get_selection_key(name: str, ingredient_pks: Iterable[int]) -> str:
+    """Return the cache key of a value that is calculated for a selection.
+
+    The order of the selection doesn't matter for any of these values, so it doesn't
+    matter for the key either.
+    """
+    selection = ",".join(str(pk) for pk in sorted(set(ingredient_pks)))
+    return f"{name}_" + hashlib.sha256(selection.encode()).hexdigest()[:32]
+
+
+def get_selection_value(
+    name: str, ingredient_pks: Iterable[int], calculate: Callable[[], T]
+) -> T:
+    """Return a cached value for a selection, calculating it if necessary."""
+    version = get_current_version()
+    if version is None:
+        return calculate()
+    return _single_flight.get(
+        get_selection_key(name, ingredient_pks), calculate, version=version.pk
+    )
+
+
+def has_selection_values(names: Iterable[str], ingredient_pks: Iterable[int]) -> bool:
+    """Check whether all the given values are already cached for a selection."""
+    version = get_current_version()
+    if version is None:
+        return False
+    selection = list(ingredient_pks)
+    keys = [get_selection_key(name, selection) for name in names]
+    return len(caches[RANKING_CACHE].get_many(keys, version=version.pk)) == len(keys)
+
+
+def get_ranking(
+    ingredient_pks: Iterable[int],
+    calculate: Callable[[], Ranking],
+    options: RankingOptions = RankingOptions(),
+) -> Ranking:
+    """Return the ranking for a selection, calculating it if it isn't cached."""
+    return get_selection_value(options.cache_name, ingredient_pks, calculate)
+
+
+class Cursor(NamedTuple):
+    """Position in a ranking: the last entry of a page.
+
+    Rankings are ordered by descending score and then by descending ID, so the next
+    page can be found with binary search.
+    """
+
+    #: Dataset version that the ranking was calculated for.
+    version_pk: Optional[int]
+    score: float
+    ingredient_pk: int
+
+    def encode(self) -> str:
+        """Return the cursor as an opaque token for URLs."""
+        version = "" if self.version_pk is None else str(self.version_pk)
+        value = f"{version}:{self.score.hex()}:{self.ingredient_pk}"
+        return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "Cursor":
+        """Parse a token that was created by :meth:`encode`.
+
+        :raises ValueError: If the token is invalid.
+        """
+        value = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        version, score, ingredient_pk = value.split(":")
+        return cls(
+            int(version) if version else None, float.fromhex(score), int(ingredient_pk)
+        )
+
+
+def get_page(
+    ranking: Ranking, after: Optional[Cursor], count: int, version_pk: Optional[int]
+) -> tuple[Ranking, Optional[Cursor]]:
+    """Take a page of a ranking.
+
+    :param after: Cursor of the previous page, or ``None`` for the first page.
+    :param version_pk: Dataset version that the ranking was calculated for.
+    :return: The entries on the page and the cursor for the next page, which is
+        ``None`` if this is the last one.
+    """
+    start = 0
+    if after is not None:
+        # Find the first entry that is ranked lower than the cursor.
+        end = len(ranking)
+        while start < end:
+            middle = (start + end) // 2
+            ingredient_pk, score = ranking[middle]
+            if (score, ingredient_pk) >= (after.score, after.ingredient_pk):
+                start = middle + 1
+            else:
+                end = middle
+
+    page = ranking[start : start + count]
+    if not page or start + count >= len(ranking):
+        return page, None
+    ingredient_pk, score = page[-1]
+    return page, Cursor(version_pk, score, ingredient_pk)
+
+
+def hydrate(*pages: Ranking) -> list[list[Ingredient]]:
+    """Load the ingredients of one or more ranking pages.
+
+    All pages are loaded in a single query. Each ingredient has the ``display_name``
+    and ``weighted_score`` attributes set, just like the results of
+    :meth:`~cookpot.ingredients.views.PairingResultsView.calculate_suggested_ingredients`.
+    """
+    ingredients_by_pk = Ingredient.objects.annotate_display_name().in_bulk(
+        {ingredient_pk for page in pages for ingredient_pk, _ in page}
+    )
+    result = list[list[Ingredient]]()
+    for page in pages:
+        ingredients = list[Ingredient]()
+        for ingredient_pk, weighted_score in page:
+            ingredient = ingredients_by_pk.get(ingredient_pk)
+            if ingredient is not None:
+                ingredient.weighted_score = weighted_score  # type: ignore[attr-defined]
+                ingredients.append(ingredient)
+        result.append(ingredients)
+    return result
@@ -0,0 +1,359 @@
+"""Ingredient name search.
+
+Searching works through a pluggable backend, configured with the ``SEARCH_BACKEND``
+setting. All backends keep their own index of the names of data-bearing ingredients,
+which is refreshed by the ``sync`` command. Names are folded (see :func:`fold`) before
+they are indexed, so that searches ignore case and accents.
+
+Backends only differ in how they find candidate names. The candidates are then ranked
+by :func:`rank_matches`, so that every backend returns the same results.
+"""
+from __future__ import annotations
+
+import abc
+import sqlite3
+import unicodedata
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from typing import Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from .dataset import VersionedValue
+from .models import IngredientName
+
+#: Minimum similarity of two (folded) strings for them to be considered a fuzzy match.
+SIMILARITY_THRESHOLD = 0.5
+
+#: First SQLite version with the FTS5 trigram tokenizer. With older versions, the
+#: search index migration doesn't create the FTS table and the n-gram backend is used.
+SQLITE_TRIGRAM_VERSION = (3, 34, 0)
+
+
+def fold(text: str) -> str:
+    """Normalize a string for searching by removing accents and case."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(
+        character for character in decomposed if not unicodedata.combining(character)
+    ).casefold()
+
+
+def get_index_entries() -> Iterator[tuple[int, str]]:
+    """Yield the ingredient ID and folded label of all names that should be indexed."""
+    for ingredient_id, label in (
+        IngredientName.objects.filter(ingredient__has_data=True)
+        .order_by()
+        .values_list("ingredient_id", "label")
+        .iterator()
+    ):
+        yield ingredient_id, fold(label)
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _get_padded_trigrams(text: str) -> set[str]:
+    """Split a string into trigrams the same way ``pg_trgm`` does."""
+    trigrams = set[str]()
+    for word in text.split():
+        padded_word = f"  {word} "
+        trigrams.update(
+            padded_word[index : index + 3] for index in range(len(padded_word) - 2)
+        )
+    return trigrams
+
+
+def _get_similarity(query_trigrams: set[str], label: str) -> float:
+    """Calculate the trigram similarity of a label, like ``pg_trgm``'s similarity()."""
+    label_trigrams = _get_padded_trigrams(label)
+    shared_count = len(query_trigrams & label_trigrams)
+    if shared_count == 0:
+        return 0.0
+    return shared_count / (len(query_trigrams) + len(label_trigrams) - shared_count)
+
+
+def rank_matches(
+    query: str, candidates: Iterable[tuple[int, str]], limit: int
+) -> list[int]:
+    """Rank candidate names for a (folded) query.
+
+    A name matches if it contains the query or if its trigram similarity to the query
+    is above :data:`SIMILARITY_THRESHOLD`. Names that contain the query rank before
+    fuzzy matches and ties are broken by label, so the order doesn't depend on the
+    order of the candidates.
+
+    :param candidates: Ingredient IDs and folded labels. These may include names that
+        don't match.
+    :return: IDs of at most ``limit`` ingredients, best matches first.
+    """
+    query_trigrams = _get_padded_trigrams(query)
+    sort_keys = dict[int, tuple[float, str]]()
+    for ingredient_id, label in candidates:
+        similarity = _get_similarity(query_trigrams, label)
+        score = similarity if similarity > SIMILARITY_THRESHOLD else 0.0
+        if query in label:
+            # Substring matches always rank before fuzzy ones.
+            score += 1
+        elif score == 0:
+            continue
+        sort_key = (-score, label)
+        if ingredient_id not in sort_keys or sort_key < sort_keys[ingredient_id]:
+            sort_keys[ingredient_id] = sort_key
+    ranking = sorted(
+        sort_keys, key=lambda ingredient_id: (sort_keys[ingredient_id], ingredient_id)
+    )
+    return ranking[:limit]
+
+
+class SearchBackend(abc.ABC):
+    """Base class for ingredient search backends."""
+
+    @abc.abstractmethod
+    def search(self, query: str, limit: int) -> list[int]:
+        """Find ingredients that have a name matching the query.
+
+        :return: IDs of at most ``limit`` ingredients, best matches first.
+        """
+
+    @abc.abstractmethod
+    def rebuild(self) -> None:
+        """Rebuild the search index from the current dataset."""
+
+
+class SqliteFtsSearchBackend(SearchBackend):
+    """Search backend that uses an SQLite FTS5 table with the trigram tokenizer.
+
+    Candidates are the names that share a trigram with one of the query's words (or,
+    for words that are shorter than a trigram, contain the word). Names that are
+    similar enough to the query always share one of these.
+
+    The tokenizer itself can't fold accents (at least not in the SQLite versions we
+    care about), so labels are folded before they are stored. The table is created
+    by a migration, or by :meth:`rebuild` when SQLite was too old for the tokenizer
+    at the time the migration ran.
+    """
+
+    table_name = "ingredients_search_fts"
+
+    def search(self, query: str, limit: int) -> list[int]:
+        folded_query = fold(query)
+        if not folded_query.strip():
+            return []
+
+        words = folded_query.split()
+        trigrams = sorted(
+            {
+                word[start : start + 3]
+                for word in words
+                for start in range(len(word) - 2)
+            }
+        )
+        statements, params = list[str](), list[str]()
+        if trigrams:
+            statements.append(
+                f"SELECT ingredient_id, label FROM {self.table_name} "
+                f"WHERE {self.table_name} MATCH %s"
+            )
+            params.append(
+                " OR ".join(
+                    '"' + trigram.replace('"', '""') + '"' for trigram in trigrams
+                )
+            )
+        for word in words:
+            if len(word) < 3:
+                # The trigram tokenizer can't answer queries that are shorter than a
+                # single trigram, so fall back to a substring search.
+                statements.append(
+                    f"SELECT ingredient_id, label FROM {self.table_name} "
+                    f"WHERE label LIKE %s ESCAPE '\\'"
+                )
+                params.append(f"%{_escape_like(word)}%")
+
+        with connection.cursor() as cursor:
+            cursor.execute(" UNION ".join(statements), params)
+            return rank_matches(folded_query, cursor.fetchall(), limit)
+
+    @transaction.atomic
+    def rebuild(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table_name} "
+                "USING fts5(label, ingredient_id UNINDEXED, tokenize='trigram')"
+            )
+            cursor.execute(f"DELETE FROM {self.table_name}")
+            cursor.executemany(
+                f"INSERT INTO {self.table_name} (ingredient_id, label) VALUES (%s, %s)",
+                list(get_index_entries()),
+            )
+
+
+class PostgresTrigramSearchBackend(SearchBackend):
+    """Search backend that uses a table with a GIN trigram index on PostgreSQL.
+
+    Candidates are the names that contain the query or are similar enough according to
+    ``pg_trgm``. Both conditions can be answered from the index.
+    """
+
+    table_name = "ingredients_search_trigram"
+
+    def search(self, query: str, limit: int) -> list[int]:
+        folded_query = fold(query)
+        if not folded_query.strip():
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT ingredient_id, label
+                FROM {self.table_name}
+                WHERE
+                    (label %% %s AND similarity(label, %s) > %s)
+                    OR label LIKE %s
+                """,
+                (
+                    folded_query,
+                    folded_query,
+                    SIMILARITY_THRESHOLD,
+                    f"%{_escape_like(folded_query)}%",
+                ),
+            )
+            return rank_matches(folded_query, cursor.fetchall(), limit)
+
+    @transaction.atomic
+    def rebuild(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {self.table_name}")
+            cursor.executemany(
+                f"INSERT INTO {self.table_name} (ingredient_id, label) VALUES (%s, %s)",
+                list(get_index_entries()),
+            )
+
+
+class _NgramIndex:
+    def __init__(self, entries: Iterator[tuple[int, str]]):
+        self.ingredient_ids = list[int]()
+        self.labels = list[str]()
+        #: Maps each substring of up to three characters to the entries containing it.
+        self.substring_postings = dict[str, list[int]]()
+        #: Maps padded word trigrams to the entries containing them.
+        self.trigram_postings = dict[str, list[int]]()
+        self.trigram_counts = list[int]()
+
+        for entry_index, (ingredient_id, label) in enumerate(entries):
+            self.ingredient_ids.append(ingredient_id)
+            self.labels.append(label)
+
+            substrings = {
+                label[start : start + length]
+                for length in range(1, 4)
+                for start in range(len(label) - length + 1)
+            }
+            for substring in substrings:
+                self.substring_postings.setdefault(substring, []).append(entry_index)
+
+            trigrams = _get_padded_trigrams(label)
+            self.trigram_counts.append(len(trigrams))
+            for trigram in trigrams:
+                self.trigram_postings.setdefault(trigram, []).append(entry_index)
+
+    def find_substring_matches(self, query: str) -> set[int]:
+        if len(query) <= 3:
+            return set(self.substring_postings.get(query, ()))
+
+        # Intersect the postings of all trigrams in the query, starting with the
+        # rarest one. The remaining candidates then need to be verified, because
+        # containing all trigrams doesn't mean they are in the right order.
+        posting_lists = sorted(
+            (
+                self.substring_postings.get(query[start : start + 3], [])
+                for start in range(len(query) - 2)
+            ),
+            key=len,
+        )
+        candidates = set(posting_lists[0])
+        for posting_list in posting_lists[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(posting_list)
+        return {
+            entry_index
+            for entry_index in candidates
+            if query in self.labels[entry_index]
+        }
+
+    def find_similar(self, query: str) -> dict[int, float]:
+        query_trigrams = _get_padded_trigrams(query)
+        shared_counts = Counter[int]()
+        for trigram in query_trigrams:
+            shared_counts.update(self.trigram_postings.get(trigram, ()))
+
+        similarities = dict[int, float]()
+        for entry_index, shared_count in shared_counts.items():
+            similarity = shared_count / (
+                len(query_trigrams) + self.trigram_counts[entry_index] - shared_count
+            )
+            if similarity > SIMILARITY_THRESHOLD:
+                similarities[entry_index] = similarity
+        return similarities
+
+    def search(self, query: str, limit: int) -> list[int]:
+        candidates = self.find_similar(query).keys() | self.find_substring_matches(
+            query
+        )
+        return rank_matches(
+            query,
+            (
+                (self.ingredient_ids[entry_index], self.labels[entry_index])
+                for entry_index in candidates
+            ),
+            limit,
+        )
+
+
+class NgramSearchBackend(SearchBackend):
+    """Search backend that keeps an n-gram index in the memory of each process.
+
+    This doesn't need any database support and is a good fit for small deployments.
+    The index is built on first use and again whenever the dataset version changes.
+    """
+
+    def __init__(self) -> None:
+        self._index = VersionedValue(lambda: _NgramIndex(get_index_entries()))
+
+    def search(self, query: str, limit: int) -> list[int]:
+        folded_query = fold(query)
+        if not folded_query.strip():
+            return []
+        return self._index.get().search(folded_query, limit)
+
+    def rebuild(self) -> None:
+        self._index.clear()
+
+
+_search_backend: Optional[SearchBackend] = None
+
+
+def get_search_backend() -> SearchBackend:
+    """Return the configured search backend.
+
+    If the ``SEARCH_BACKEND`` setting is ``None``, a backend is chosen according to
+    the database that is in use.
+    """
+    global _search_backend
+    if _search_backend is None:
+        if settings.SEARCH_BACKEND is not None:
+            backend_class = import_string(settings.SEARCH_BACKEND)
+        elif connection.vendor == "postgresql":
+            backend_class = PostgresTrigramSearchBackend
+        elif (
+            connection.vendor == "sqlite"
+            and sqlite3.sqlite_version_info >= SQLITE_TRIGRAM_VERSION
+        ):
+            backend_class = SqliteFtsSearchBackend
+        else:
+            backend_class = NgramSearchBackend
+        _search_backend = backend_class()
+    assert isinstance(_search_backend, SearchBackend)
+    return _search_backend
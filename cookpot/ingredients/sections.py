@@ -0,0 +1,178 @@
+"""Sections are the top-level ingredient categories that are shown on the index page.
+
+The card fragment for each section only changes when the dataset does, so it is
+rendered once per dataset version and cached.
+"""
+import math
+from typing import Any
+
+from django.core.cache import caches
+from django.db import models
+from django.template.loader import render_to_string
+
+from .dataset import VersionedValue, get_current_version
+from .models import DatasetVersion, Ingredient
+from .search import get_search_backend
+
+#: Name of the cache that rendered fragments are stored in.
+FRAGMENT_CACHE = "fragments"
+
+#: All sections that could possibly exist. Only these are cached, so that arbitrary
+#: request parameters can't fill up the cache.
+KNOWN_SECTIONS = frozenset(
+    category.split("-")[0] for category in Ingredient.Category.values
+)
+
+Library = list[tuple[str, str, list[Ingredient]]]
+
+
+def summarize_sections() -> list[dict[str, Any]]:
+    """Build a summary of all sections that currently have ingredients.
+
+    This is stored on each :class:`DatasetVersion`. For each section, the number of
+    data-bearing ingredients is counted, both in total and per category.
+    """
+    sections = dict[str, dict[str, Any]]()
+    for category, count in (
+        Ingredient.objects.order_by("category")
+        .values_list("category")
+        .annotate(count=models.Count("pk", filter=models.Q(has_data=True)))
+    ):
+        section = sections.setdefault(
+            category.split("-")[0],
+            {"key": category.split("-")[0], "count": 0, "categories": {}},
+        )
+        section["count"] += count
+        section["categories"][category] = count
+    return [sections[key] for key in sorted(sections)]
+
+
+def _get_section_keys() -> list[str]:
+    version = get_current_version()
+    if version is None:
+        summary = summarize_sections()
+    else:
+        summary = version.sections
+    return [section["key"] for section in summary]
+
+
+_section_keys = VersionedValue(_get_section_keys)
+
+
+def get_sections() -> list[tuple[str, str]]:
+    """Return the keys and labels of all sections that currently have ingredients.
+
+    Once a dataset version has been published, this doesn't need any queries.
+    """
+    return [
+        (key, Ingredient.Category.get_label(key)) for key in _section_keys.get()
+    ]
+
+
+def get_section_ingredients(section: str) -> list[Ingredient]:
+    return list(
+        Ingredient.objects.filter_with_data()
+        .filter(category__startswith=section)
+        .annotate_display_name()
+        .order_by("display_name")
+    )
+
+
+def search_ingredients(search_query: str) -> list[Ingredient]:
+    ingredient_pks = get_search_backend().search(search_query, 30)
+    all_ingredients = list(
+        Ingredient.objects.filter_with_data()
+        .filter(pk__in=ingredient_pks)
+        .annotate_display_name()
+        .order_by("display_name")
+    )
+
+    # The results should all have the same category because we don't want to group
+    # them.
+    for ingredient in all_ingredients:
+        ingredient.category = "Results"
+
+    return all_ingredients
+
+
+def group_ingredients(all_ingredients: list[Ingredient]) -> Library:
+    """Group ingredients into (roughly) equally-sized card fans for each category.
+
+    The order of ingredients inside each category is preserved.
+    """
+    ingredients_by_category = dict[str, list[Ingredient]]()
+    for ingredient in all_ingredients:
+        ingredients_by_category.setdefault(ingredient.category, []).append(ingredient)
+
+    library = Library()
+    for category in sorted(ingredients_by_category):
+        ingredients = ingredients_by_category[category]
+
+        # Try to make equally-sized groups.
+        group_count = math.ceil(len(ingredients) / 17)
+        group_size = math.ceil(len(ingredients) / group_count)
+        group_number = 1
+        while len(ingredients) > 0:
+            category_label = Ingredient.Category.get_label(category) + (
+                f" ({group_number})" if group_count > 1 else ""
+            )
+            library.append(
+                (f"{category}-{group_number}", category_label, ingredients[:group_size])
+            )
+            ingredients = ingredients[group_size:]
+            group_number += 1
+
+    return library
+
+
+def render_library(library: Library) -> str:
+    return render_to_string("data/section_cards.html", {"library": library})
+
+
+def render_section_fragment(section: str) -> str:
+    """Render the card fragment for a section, bypassing the cache."""
+    return render_library(group_ingredients(get_section_ingredients(section)))
+
+
+def _get_cache_key(section: str) -> str:
+    return f"section_cards:{section}"
+
+
+def get_section_fragment(section: str) -> str:
+    """Return the card fragment for a section, using the cache when possible."""
+    version = get_current_version()
+    if version is None or section not in KNOWN_SECTIONS:
+        return render_section_fragment(section)
+
+    cache = caches[FRAGMENT_CACHE]
+    cache_key = _get_cache_key(section)
+    fragment = cache.get(cache_key, version=version.pk)
+    if fragment is None:
+        fragment = render_section_fragment(section)
+        cache.set(cache_key, fragment, None, version=version.pk)
+    assert isinstance(fragment, str)
+    return fragment
+
+
+def prewarm_section_fragments(version: DatasetVersion) -> int:
+    """Render and cache the fragments of all sections for a new dataset version.
+
+    :return: The number of cached sections.
+    """
+    sections = [section["key"] for section in version.sections]
+    caches[FRAGMENT_CACHE].set_many(
+        {
+            _get_cache_key(section): render_section_fragment(section)
+            for section in sections
+        },
+        None,
+        version=version.pk,
+    )
+    return len(sections)
+
+
+def discard_section_fragments(version: DatasetVersion) -> None:
+    """Remove the fragments of a previous dataset version from the cache."""
+    caches[FRAGMENT_CACHE].delete_many(
+        [_get_cache_key(section) for section in KNOWN_SECTIONS], version=version.pk
+    )
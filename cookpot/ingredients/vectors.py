@@ -0,0 +1,98 @@
+"""Sparse flavour vectors of all data-bearing ingredients.
+
+These allow clients to calculate the matching score of a selection themselves (see
+:meth:`~cookpot.ingredients.views.PairingResultsView.calculate_matching_score`): the
+shared molecules are those that appear in the vectors of all selected ingredients,
+and the matching score is the sum of their scores divided by the sum of all scores of
+the selected ingredients.
+
+The vectors are serialized as JSON in this format::
+
+    {
+        "version": 12,
+        "ingredients": {
+            "<ingredient ID>": [[<molecule ID deltas>], [<scores>]],
+            ...
+        }
+    }
+
+Molecule IDs are sorted and delta-encoded: the first entry is the ID itself and each
+following entry is the difference to the previous ID. Scores are rounded to a few
+significant digits.
+"""
+import json
+from typing import Any, Optional
+
+from django.core.cache import caches
+from django.db import models
+
+from .dataset import get_current_version
+from .models import DatasetVersion, MoleculeOccurrence
+from .sections import FRAGMENT_CACHE
+
+CACHE_KEY = "flavor_vectors"
+
+#: Number of significant digits that scores are rounded to.
+SCORE_DIGITS = 6
+
+
+def build_flavor_vectors(version: Optional[DatasetVersion]) -> str:
+    """Serialize the flavour vectors of all data-bearing ingredients."""
+    vectors = dict[str, Any]()
+    previous_ingredient_id = None
+    molecule_deltas = list[int]()
+    scores = list[float]()
+    previous_molecule_id = 0
+
+    for ingredient_id, molecule_id, score in (
+        MoleculeOccurrence.objects.with_score(filter_zero=False)
+        .filter(
+            models.Q(foodb_content_sample_count__gt=0) | models.Q(flavordb_found=True)
+        )
+        .order_by("ingredient_id", "molecule_id")
+        .values_list("ingredient_id", "molecule_id", "score")
+        .iterator()
+    ):
+        if ingredient_id != previous_ingredient_id:
+            molecule_deltas, scores = [], []
+            vectors[str(ingredient_id)] = [molecule_deltas, scores]
+            previous_ingredient_id = ingredient_id
+            previous_molecule_id = 0
+        molecule_deltas.append(molecule_id - previous_molecule_id)
+        previous_molecule_id = molecule_id
+        scores.append(float(f"{max(score or 0.0, 0.0):.{SCORE_DIGITS}g}"))
+
+    return json.dumps(
+        {
+            "version": version.pk if version is not None else None,
+            "ingredients": vectors,
+        },
+        separators=(",", ":"),
+    )
+
+
+def prewarm_flavor_vectors(version: DatasetVersion) -> None:
+    """Serialize and cache the flavour vectors for a new dataset version."""
+    caches[FRAGMENT_CACHE].set(
+        CACHE_KEY, build_flavor_vectors(version), None, version=version.pk
+    )
+
+
+def discard_flavor_vectors(version: DatasetVersion) -> None:
+    """Remove the vectors of a previous dataset version from the cache."""
+    caches[FRAGMENT_CACHE].delete(CACHE_KEY, version=version.pk)
+
+
+def get_flavor_vectors() -> str:
+    """Return the serialized flavour vectors, using the cache when possible."""
+    version = get_current_version()
+    if version is None:
+        return build_flavor_vectors(None)
+
+    cache = caches[FRAGMENT_CACHE]
+    vectors = cache.get(CACHE_KEY, version=version.pk)
+    if vectors is None:
+        vectors = build_flavor_vectors(version)
+        cache.set(CACHE_KEY, vectors, None, version=version.pk)
+    assert isinstance(vectors, str)
+    return vectors
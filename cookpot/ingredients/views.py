@@ -1,42 +1,89 @@
-import math
-from collections.abc import Sequence
-from typing import Any
+import asyncio
+import contextlib
+from collections.abc import Collection, Sequence
+from typing import Any, Optional
+from urllib.parse import urlencode
 
 from django.conf import settings
-from django.contrib.postgres.search import TrigramSimilarity
-from django.db import models
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db import connection, models
 from django.db.models import expressions, functions
 from django.http import (
     HttpRequest,
     HttpResponse,
     HttpResponseBadRequest,
+    HttpResponseForbidden,
     HttpResponseNotAllowed,
+    JsonResponse,
 )
-from django.shortcuts import render
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
+from django.utils.cache import (
+    add_never_cache_headers,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.static import serve
 
+from . import autocomplete as autocomplete_index
+from .admission import RETRY_AFTER, Rejected, get_pairing_gate, is_heavy_pairing
+from .caching import dataset_conditional
+from .compression import VARIANT_SUFFIXES, accepts_encoding
+from .concurrency import run_query
+from .dataset import get_current_version, get_median_foodb_content
+from .instrumentation import registry as metrics_registry
+from .jobs import enqueue_pairing_job
 from .models import (
     Ingredient,
-    IngredientName,
     IngredientQuerySet,
     Molecule,
     MoleculeOccurrence,
+    PairingJob,
+)
+from .pagerank import rank_by_pagerank
+from .postings import explain_pairing
+from .ranking import (
+    RANKING_MODES,
+    Cursor,
+    Ranking,
+    RankingOptions,
+    get_page,
+    get_ranking,
+    get_selection_value,
+    has_selection_values,
+    hydrate,
+)
+from .sections import (
+    get_section_fragment,
+    get_sections,
+    group_ingredients,
+    render_library,
+    search_ingredients,
 )
+from .vectors import get_flavor_vectors
+
+#: Number of best suggestions that are shown at once.
+SUGGESTION_PAGE_SIZE = 15
+
+#: Number of worst suggestions that are shown.
+NOT_MATCHING_COUNT = 6
+
+#: Maximum number of molecules that can be requested in a pairing explanation.
+MAX_EXPLANATION_MOLECULES = 50
 
+#: Static files with a content hash in their name never change, so they are cached
+#: for a year.
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
 
+
+@dataset_conditional
 def index(request: HttpRequest) -> HttpResponse:
     if request.method != "GET":
         return HttpResponseNotAllowed(permitted_methods=["GET"])
 
-    sections = set[str]()
-    for (category,) in (
-        Ingredient.objects.values_list("category").distinct().order_by("category")
-    ):
-        sections.add(category.split("-")[0])
-
-    sections_with_labels = [
-        (key, Ingredient.Category.get_label(key)) for key in sorted(sections)
-    ]
+    sections_with_labels = get_sections()
 
     return render(
         request,
@@ -53,77 +100,143 @@ def index(request: HttpRequest) -> HttpResponse:
     )
 
 
-def section_cards(request: HttpRequest) -> HttpResponse:
-    if request.method != "GET":
-        return HttpResponseNotAllowed(permitted_methods=["GET"])
+def _get_section_parameters(request: HttpRequest) -> Optional[tuple[str, str]]:
+    """Parse the ``section`` and ``query`` parameters of a section cards request.
 
+    Exactly one of them must be given. Returns ``None`` if the request is invalid.
+    """
     section = request.GET.get("section", "").strip()
     search_query = request.GET.get("query", "").strip()
     if (not section and not search_query) or (section and search_query):
-        return HttpResponseBadRequest()
+        return None
     assert isinstance(section, str)
+    assert isinstance(search_query, str)
+    return section, search_query
+
+
+def _render_search_results(
+    request: HttpRequest, all_ingredients: list[Ingredient]
+) -> HttpResponse:
+    if len(all_ingredients) == 0:
+        return render(request, "data/empty_search_results.html")
+    return HttpResponse(render_library(group_ingredients(all_ingredients)))
+
+
+@dataset_conditional
+def section_cards(request: HttpRequest) -> HttpResponse:
+    if request.method != "GET":
+        return HttpResponseNotAllowed(permitted_methods=["GET"])
+
+    parameters = _get_section_parameters(request)
+    if parameters is None:
+        return HttpResponseBadRequest()
+    section, search_query = parameters
 
     # When getting a single section, we want to group them by category. When searching,
     # we just want to return everything.
     if search_query:
-        all_ingredients = list(
-            Ingredient.objects.filter_with_data()
-            .annotate_display_name()
-            .filter(
-                models.Exists(
-                    IngredientName.objects.annotate(
-                        rank=TrigramSimilarity("label", search_query)
-                    ).filter(
-                        models.Q(rank__gt=0.5)
-                        | models.Q(label__unaccent__icontains=search_query),
-                        ingredient=models.OuterRef("pk"),
-                    )
-                )
-            )
-            .order_by("display_name")
-            .distinct()[:30]
-        )
+        return _render_search_results(request, search_ingredients(search_query))
+    return HttpResponse(get_section_fragment(section))
 
-        if len(all_ingredients) == 0:
-            return render(request, "data/empty_search_results.html")
 
-        # The results should all have the same category because we don't want
-        # to group them.
-        for ingredient in all_ingredients:
-            ingredient.category = "Results"
-    else:
-        all_ingredients = list(
-            Ingredient.objects.filter_with_data()
-            .filter(category__startswith=section)
-            .annotate_display_name()
-            .order_by("display_name")
+@dataset_conditional
+async def section_cards_async(request: HttpRequest) -> HttpResponse:
+    """Asynchronous variant of :func:`section_cards`."""
+    if request.method != "GET":
+        return HttpResponseNotAllowed(permitted_methods=["GET"])
+
+    parameters = _get_section_parameters(request)
+    if parameters is None:
+        return HttpResponseBadRequest()
+    section, search_query = parameters
+
+    if search_query:
+        return _render_search_results(
+            request, await run_query(search_ingredients, search_query)
         )
+    return HttpResponse(await run_query(get_section_fragment, section))
+
+
+@dataset_conditional
+def autocomplete(request: HttpRequest) -> HttpResponse:
+    if request.method != "GET":
+        return HttpResponseNotAllowed(permitted_methods=["GET"])
+
+    prefix = request.GET.get("query", "")
+    try:
+        limit = int(request.GET.get("limit", "10"))
+    except ValueError:
+        return HttpResponseBadRequest()
+    if limit < 1:
+        return HttpResponseBadRequest()
+
+    return JsonResponse(
+        {
+            "completions": [
+                {"ingredient": completion.ingredient_id, "label": completion.label}
+                for completion in autocomplete_index.complete(prefix, limit)
+            ]
+        }
+    )
+
+
+def _get_more_suggestions_url(
+    ingredient_pks: Sequence[int], after: Optional[Cursor], options: RankingOptions
+) -> Optional[str]:
+    if after is None:
+        return None
+    query = urlencode(
+        {
+            "ingredients": ",".join(map(str, ingredient_pks)),
+            "after": after.encode(),
+            **options.get_parameters(),
+        }
+    )
+    return f"{reverse('more_suggestions')}?{query}"
 
-    categories = sorted({ingredient.category for ingredient in all_ingredients})
-
-    library = list[tuple[str, str, list[Ingredient]]]()
-    for category in categories:
-        ingredients = [
-            ingredient
-            for ingredient in all_ingredients
-            if ingredient.category == category
-        ]
-
-        # Try to make equally-sized groups.
-        group_count = math.ceil(len(ingredients) / 17)
-        group_size = math.ceil(len(ingredients) / group_count)
-        group_number = 1
-        while len(ingredients) > 0:
-            category_label = Ingredient.Category.get_label(category) + (
-                f" ({group_number})" if group_count > 1 else ""
-            )
-            library.append(
-                (f"{category}-{group_number}", category_label, ingredients[:group_size])
-            )
-            ingredients = ingredients[group_size:]
-            group_number += 1
 
-    return render(request, "data/section_cards.html", {"library": library})
+def _get_overloaded_response() -> HttpResponse:
+    response = HttpResponse(
+        "Too many requests are being processed right now. Please try again shortly.",
+        content_type="text/plain",
+        status=503,
+    )
+    response["Retry-After"] = str(RETRY_AFTER)
+    add_never_cache_headers(response)
+    return response
+
+
+def _get_expired_ranking_response() -> HttpResponse:
+    response = HttpResponse(
+        "The ingredient data was updated since these suggestions were calculated. "
+        "Please reload them.",
+        content_type="text/plain",
+        status=410,
+    )
+    add_never_cache_headers(response)
+    return response
+
+
+def _get_job_url(job: PairingJob) -> str:
+    return f"{reverse('pairing_job')}?{urlencode({'id': job.pk})}"
+
+
+def _get_job_response(job: PairingJob) -> HttpResponse:
+    """Return the result of a pairing job or, if it isn't done yet, its status.
+
+    Unfinished jobs are answered with "202 Accepted" and a JSON document that contains
+    the URL to poll.
+    """
+    if job.status == PairingJob.Status.DONE:
+        return HttpResponse(job.result)
+
+    response = JsonResponse(
+        {"job": job.pk, "status": job.status, "url": _get_job_url(job)},
+        status=500 if job.status == PairingJob.Status.FAILED else 202,
+    )
+    response["Retry-After"] = "1"
+    add_never_cache_headers(response)
+    return response
 
 
 class PairingResultsView(View):
@@ -144,13 +257,18 @@ class PairingResultsView(View):
             ]
         )
 
+        median_foodb_content = get_median_foodb_content()
         shared_ingredient_score = (
-            MoleculeOccurrence.objects.with_score()
+            MoleculeOccurrence.objects.with_score(
+                median_foodb_content=median_foodb_content
+            )
             .filter(ingredient__in=ingredient_pks, molecule__in=shared_molecules)
             .aggregate(value=models.Sum("score"))
         )
         total_ingredient_score = (
-            MoleculeOccurrence.objects.with_score()
+            MoleculeOccurrence.objects.with_score(
+                median_foodb_content=median_foodb_content
+            )
             .filter(ingredient__in=ingredient_pks)
             .aggregate(value=models.Sum("score"))
         )
@@ -165,12 +283,16 @@ class PairingResultsView(View):
 
     @classmethod
     def calculate_suggested_ingredients(
-        cls, ingredient_pks: Sequence[int], *, reverse: bool = False
+        cls,
+        ingredient_pks: Sequence[int],
+        *,
+        reverse: bool = False,
+        categories: Optional[Collection[str]] = None,
     ) -> IngredientQuerySet:
         # Group by molecule and sum up these scores for all the ingredients that were
         # selected. This gives us a list of molecules in our query.
         scored_molecule_occurrences = MoleculeOccurrence.objects.with_score(
-            filter_zero=False
+            filter_zero=False, median_foodb_content=get_median_foodb_content()
         ).filter(ingredient__in=ingredient_pks)
         (
             scored_molecule_occurrences_sql,
@@ -231,6 +353,10 @@ class PairingResultsView(View):
             # By default, highest-ranking results are returned first.
             .order_by("-weighted_score" if not reverse else "weighted_score")
         )
+        if categories is not None:
+            # Restricting the candidates up front means that the scores are only
+            # calculated for those that can actually be suggested.
+            base_queryset = base_queryset.filter(category__in=sorted(categories))
 
         (
             base_queryset_sql,
@@ -249,32 +375,402 @@ class PairingResultsView(View):
             (*scored_molecules.params, *base_queryset_params),
         )
 
-    def get(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+    @classmethod
+    def get_selected_ingredient_pks(cls, request: HttpRequest) -> Optional[list[int]]:
+        """Parse the ``ingredients`` parameter of a request.
+
+        Returns ``None`` if the request is invalid.
+        """
         ingredients_parameter = request.GET.get("ingredients", "")
         if not isinstance(ingredients_parameter, str):
-            return HttpResponseBadRequest()
+            return None
         selected_ingredient_pks = list[int]()
         for value in ingredients_parameter.split(","):
             try:
                 selected_ingredient_pks.append(int(value.strip()))
             except ValueError:
-                return HttpResponseBadRequest()
-        selected_ingredient_pks = selected_ingredient_pks[
-            : settings.INGREDIENT_COUNT_CAP
-        ]
-
-        return render(
-            request,
-            "data/pairing_results.html",
-            {
-                "matching_score": self.calculate_matching_score(
-                    selected_ingredient_pks
-                ),
-                "matching_ingredients": self.calculate_suggested_ingredients(
-                    selected_ingredient_pks
-                )[:15],
-                "not_matching_ingredients": self.calculate_suggested_ingredients(
-                    selected_ingredient_pks, reverse=True
-                )[:6],
-            },
+                return None
+        return selected_ingredient_pks[: settings.INGREDIENT_COUNT_CAP]
+
+    @classmethod
+    def get_ranking_options(cls, request: HttpRequest) -> Optional[RankingOptions]:
+        """Parse the ``ranking``, ``include`` and ``exclude`` parameters of a request.
+
+        The latter two are lists of categories, which also match their subcategories
+        (``fruit`` and ``fruit-*`` both match ``fruit-berry``). Returns ``None`` if the
+        request is invalid.
+        """
+        mode = request.GET.get("ranking", RANKING_MODES[0])
+        if mode not in RANKING_MODES:
+            return None
+        prefixes = list[tuple[str, ...]]()
+        for name in ("include", "exclude"):
+            parameter = request.GET.get(name, "")
+            if not isinstance(parameter, str):
+                return None
+            keys = {key.strip().removesuffix("-*") for key in parameter.split(",")}
+            keys.discard("")
+            if not keys <= set(Ingredient.Category.values):
+                return None
+            prefixes.append(tuple(sorted(keys)))
+        include, exclude = prefixes
+        return RankingOptions(mode, include, exclude)
+
+    @classmethod
+    def rank_suggested_ingredients(
+        cls,
+        ingredient_pks: Sequence[int],
+        categories: Optional[Collection[str]] = None,
+    ) -> Ranking:
+        """Rank all candidates for a selection, returning only their IDs and scores."""
+        if categories is not None and not categories:
+            # Category filters can exclude everything that they include. There are no
+            # candidates then, and an empty "IN" filter can't be compiled to SQL.
+            return []
+        suggested_ingredients = cls.calculate_suggested_ingredients(
+            ingredient_pks, categories=categories
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT id, weighted_score
+                FROM ({suggested_ingredients.raw_query}) suggested_ingredients
+                ORDER BY weighted_score DESC, id DESC
+                """,
+                suggested_ingredients.params,
+            )
+            return [
+                (ingredient_pk, weighted_score or 0.0)
+                for ingredient_pk, weighted_score in cursor.fetchall()
+            ]
+
+    @classmethod
+    def get_matching_score(cls, ingredient_pks: Sequence[int]) -> float:
+        return get_selection_value(
+            "matching_score",
+            ingredient_pks,
+            lambda: cls.calculate_matching_score(ingredient_pks),
+        )
+
+    @classmethod
+    def get_ranking(
+        cls, ingredient_pks: Sequence[int], options: RankingOptions = RankingOptions()
+    ) -> Ranking:
+        categories = options.categories
+        if options.mode == "pagerank":
+            return get_ranking(
+                ingredient_pks,
+                lambda: rank_by_pagerank(ingredient_pks, categories),
+                options,
+            )
+        return get_ranking(
+            ingredient_pks,
+            lambda: cls.rank_suggested_ingredients(ingredient_pks, categories),
+            options,
+        )
+
+    @classmethod
+    def get_suggestions(
+        cls, ingredient_pks: Sequence[int], options: RankingOptions = RankingOptions()
+    ) -> tuple[list[Ingredient], list[Ingredient], Optional[str]]:
+        """Find the best and worst suggestions for a selection.
+
+        :return: The best and worst suggested ingredients and the URL of the next page
+            of best suggestions (if there are more).
+        """
+        ranking = cls.get_ranking(ingredient_pks, options)
+        version = get_current_version()
+        matching_page, next_cursor = get_page(
+            ranking,
+            None,
+            SUGGESTION_PAGE_SIZE,
+            version.pk if version is not None else None,
+        )
+        matching_ingredients, not_matching_ingredients = hydrate(
+            matching_page, ranking[-NOT_MATCHING_COUNT:][::-1]
+        )
+        return (
+            matching_ingredients,
+            not_matching_ingredients,
+            _get_more_suggestions_url(ingredient_pks, next_cursor, options),
+        )
+
+    @classmethod
+    def needs_admission(
+        cls,
+        ingredient_pks: Sequence[int],
+        value_names: Sequence[str] = ("matching_score", "ranking"),
+    ) -> bool:
+        """Check whether a request must pass admission control.
+
+        This is the case for heavy selections, unless the results are already cached.
+        """
+        return is_heavy_pairing(ingredient_pks) and not has_selection_values(
+            value_names, ingredient_pks
+        )
+
+    @classmethod
+    def get_context_data(
+        cls, ingredient_pks: Sequence[int], options: RankingOptions = RankingOptions()
+    ) -> dict[str, Any]:
+        """Calculate everything that the pairing results template needs."""
+        (
+            matching_ingredients,
+            not_matching_ingredients,
+            more_suggestions_url,
+        ) = cls.get_suggestions(ingredient_pks, options)
+        return {
+            "matching_score": cls.get_matching_score(ingredient_pks),
+            "matching_ingredients": matching_ingredients,
+            "not_matching_ingredients": not_matching_ingredients,
+            "more_suggestions_url": more_suggestions_url,
+        }
+
+    @method_decorator(dataset_conditional)
+    def get(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+        selected_ingredient_pks = self.get_selected_ingredient_pks(request)
+        options = self.get_ranking_options(request)
+        if selected_ingredient_pks is None or options is None:
+            return HttpResponseBadRequest()
+
+        needs_admission = self.needs_admission(
+            selected_ingredient_pks, ("matching_score", options.cache_name)
+        )
+        # The worker only calculates the default ranking.
+        if (
+            needs_admission
+            and settings.PAIRING_JOB_QUEUE
+            and options == RankingOptions()
+        ):
+            version = get_current_version()
+            if version is not None:
+                return _get_job_response(
+                    enqueue_pairing_job(version, selected_ingredient_pks)
+                )
+
+        try:
+            with (
+                get_pairing_gate().admit()
+                if needs_admission
+                else contextlib.nullcontext()
+            ):
+                context = self.get_context_data(selected_ingredient_pks, options)
+        except Rejected:
+            return _get_overloaded_response()
+
+        return render(request, "data/pairing_results.html", context)
+
+
+@dataset_conditional
+async def pairing_results_async(request: HttpRequest) -> HttpResponse:
+    """Asynchronous variant of :class:`PairingResultsView`.
+
+    The matching score and the suggestions are independent of each other, so they
+    are calculated concurrently.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(permitted_methods=["GET"])
+
+    selected_ingredient_pks = PairingResultsView.get_selected_ingredient_pks(request)
+    options = PairingResultsView.get_ranking_options(request)
+    if selected_ingredient_pks is None or options is None:
+        return HttpResponseBadRequest()
+
+    needs_admission = await run_query(
+        PairingResultsView.needs_admission,
+        selected_ingredient_pks,
+        ("matching_score", options.cache_name),
+    )
+    if needs_admission and settings.PAIRING_JOB_QUEUE and options == RankingOptions():
+        version = await run_query(get_current_version)
+        if version is not None:
+            return _get_job_response(
+                await run_query(enqueue_pairing_job, version, selected_ingredient_pks)
+            )
+
+    gate = get_pairing_gate()
+    # Waiting for a slot blocks, but it doesn't need a database connection. So this
+    # uses the default executor instead of the query thread pool.
+    if needs_admission and not await asyncio.to_thread(gate.try_acquire):
+        return _get_overloaded_response()
+    try:
+        matching_score, suggestions = await asyncio.gather(
+            run_query(PairingResultsView.get_matching_score, selected_ingredient_pks),
+            run_query(
+                PairingResultsView.get_suggestions, selected_ingredient_pks, options
+            ),
+        )
+    finally:
+        if needs_admission:
+            gate.release()
+    matching_ingredients, not_matching_ingredients, more_suggestions_url = suggestions
+
+    return render(
+        request,
+        "data/pairing_results.html",
+        {
+            "matching_score": matching_score,
+            "matching_ingredients": matching_ingredients,
+            "not_matching_ingredients": not_matching_ingredients,
+            "more_suggestions_url": more_suggestions_url,
+        },
+    )
+
+
+@dataset_conditional
+def more_suggestions(request: HttpRequest) -> HttpResponse:
+    """Return the next page of best suggestions for a selection.
+
+    The ``after`` parameter is the cursor of the previous page. The URL of the
+    following page is returned in the ``X-Next-Page`` header. Cursors only remain valid
+    for the dataset version they were created with, later requests are answered with
+    "410 Gone".
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(permitted_methods=["GET"])
+
+    selected_ingredient_pks = PairingResultsView.get_selected_ingredient_pks(request)
+    options = PairingResultsView.get_ranking_options(request)
+    if selected_ingredient_pks is None or options is None:
+        return HttpResponseBadRequest()
+    try:
+        after = Cursor.decode(request.GET.get("after", ""))
+    except ValueError:
+        return HttpResponseBadRequest()
+
+    version = get_current_version()
+    version_pk = version.pk if version is not None else None
+    if after.version_pk != version_pk:
+        metrics_registry.increment("cookpot_expired_rankings_total", reason="version")
+        return _get_expired_ranking_response()
+    is_cached = has_selection_values([options.cache_name], selected_ingredient_pks)
+    if version is not None and not is_cached:
+        # The ranking was evicted from the cache and needs to be calculated again.
+        # Since the dataset is the same, the cursor still points to the same place.
+        metrics_registry.increment("cookpot_expired_rankings_total", reason="evicted")
+
+    try:
+        with (
+            get_pairing_gate().admit()
+            if not is_cached and is_heavy_pairing(selected_ingredient_pks)
+            else contextlib.nullcontext()
+        ):
+            ranking = PairingResultsView.get_ranking(selected_ingredient_pks, options)
+    except Rejected:
+        return _get_overloaded_response()
+
+    page, next_cursor = get_page(ranking, after, SUGGESTION_PAGE_SIZE, version_pk)
+    (ingredients,) = hydrate(page)
+
+    response = render(
+        request, "data/more_suggestions.html", {"matching_ingredients": ingredients}
+    )
+    next_page_url = _get_more_suggestions_url(
+        selected_ingredient_pks, next_cursor, options
+    )
+    if next_page_url is not None:
+        response["X-Next-Page"] = next_page_url
+    return response
+
+
+@dataset_conditional
+def pairing_explanation(request: HttpRequest) -> HttpResponse:
+    """Explain which shared molecules make a candidate match the selection.
+
+    Each molecule's contribution is the part of the candidate's weighted score (as
+    shown in the pairing results) that it is responsible for.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(permitted_methods=["GET"])
+
+    selected_ingredient_pks = PairingResultsView.get_selected_ingredient_pks(request)
+    if selected_ingredient_pks is None:
+        return HttpResponseBadRequest()
+    try:
+        candidate_pk = int(request.GET.get("candidate", ""))
+        limit = int(request.GET.get("limit", "10"))
+    except ValueError:
+        return HttpResponseBadRequest()
+    if not 1 <= limit <= MAX_EXPLANATION_MOLECULES:
+        return HttpResponseBadRequest()
+
+    contributions = explain_pairing(selected_ingredient_pks, candidate_pk)
+    return JsonResponse(
+        {
+            "ingredient": candidate_pk,
+            "weighted_score": sum(
+                contribution.score for contribution in contributions
+            ),
+            "molecules": [
+                {
+                    "molecule": contribution.molecule_id,
+                    "pubchem_id": contribution.pubchem_id,
+                    "foodb_id": contribution.foodb_id,
+                    "contribution": contribution.score,
+                }
+                for contribution in contributions[:limit]
+            ],
+        }
+    )
+
+
+@dataset_conditional
+def flavor_vectors(request: HttpRequest) -> HttpResponse:
+    """Return the flavour vectors of all ingredients for scoring on the client.
+
+    See :mod:`cookpot.ingredients.vectors` for the format.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(permitted_methods=["GET"])
+    return HttpResponse(get_flavor_vectors(), content_type="application/json")
+
+
+def pairing_job(request: HttpRequest) -> HttpResponse:
+    """Poll a pairing job that was started by the pairing results view."""
+    if request.method != "GET":
+        return HttpResponseNotAllowed(permitted_methods=["GET"])
+
+    try:
+        job_pk = int(request.GET.get("id", ""))
+    except ValueError:
+        return HttpResponseBadRequest()
+    job = get_object_or_404(PairingJob, pk=job_pk)
+    return _get_job_response(job)
+
+
+def metrics(request: HttpRequest) -> HttpResponse:
+    """Export the metrics collected by the metrics middleware for Prometheus."""
+    if request.method != "GET":
+        return HttpResponseNotAllowed(permitted_methods=["GET"])
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        metrics_registry.render(), content_type="text/plain; version=0.0.4"
+    )
+
+
+def static_file(request: HttpRequest, path: str) -> HttpResponse:
+    """Serve a collected static file, preferring its pre-compressed variants.
+
+    This is used when the ``SERVE_STATIC`` setting is enabled. Run the ``buildstatic``
+    command first.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(permitted_methods=["GET", "HEAD"])
+
+    served_path = path
+    for encoding, suffix in VARIANT_SUFFIXES.items():
+        if accepts_encoding(request, encoding) and staticfiles_storage.exists(
+            path + suffix
+        ):
+            served_path = path + suffix
+            break
+
+    response = serve(request, served_path, document_root=settings.STATIC_ROOT)
+    patch_vary_headers(response, ("Accept-Encoding",))
+    if path in getattr(staticfiles_storage, "hashed_files", {}).values():
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True
         )
+    return response
@@ -26,6 +26,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "cookpot.ingredients.compression.CompressionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
@@ -54,13 +55,26 @@ LOGGING = {
         "verbose": {
             "format": "[{asctime}] {levelname} {module} - {message}",
             "style": "{",
-        }
+        },
+        "raw": {
+            "format": "{message}",
+            "style": "{",
+        },
     },
     "handlers": {
         "console": {
             "class": "logging.StreamHandler",
             "formatter": "verbose",
         },
+        # JSON lines written by SlowRequestCaptureMiddleware.
+        "slow_requests": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": DATA_DIR / "slow_requests.jsonl",
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "formatter": "raw",
+            "delay": True,
+        },
     },
     "root": {
         "handlers": ["console"],
@@ -70,6 +84,11 @@ LOGGING = {
         "urllib3.connectionpool": {
             "level": "WARNING",
         },
+        "cookpot.slow_requests": {
+            "handlers": ["slow_requests"],
+            "level": "INFO",
+            "propagate": False,
+        },
     },
 }
 
@@ -98,6 +117,28 @@ CACHES = {
             "MAX_ENTRIES": 1500,
         },
     },
+    # Rendered HTML fragments. These are keyed by dataset version and prewarmed by the
+    # sync command, so this must be shared between all processes.
+    "fragments": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": DATA_DIR / "fragments",
+    },
+    # Data structures that are derived from the dataset, like the molecule postings
+    # index. These are built by the sync command for each dataset version.
+    "indexes": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": DATA_DIR / "indexes",
+    },
+    # Suggestion rankings of recent pairing requests, used to page through more
+    # suggestions without ranking them again.
+    "rankings": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": DATA_DIR / "rankings",
+        "TIMEOUT": 600,
+        "OPTIONS": {
+            "MAX_ENTRIES": 1000,
+        },
+    },
 }
 
 
@@ -136,6 +177,7 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.0/howto/static-files/
 
 STATIC_URL = "static/"
+STATIC_ROOT = DATA_DIR / "static"
 STATICFILES_DIRS = [
     BASE_DIR / "cookpot" / "static",
 ]
@@ -145,10 +187,95 @@ STATICFILES_DIRS = [
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+SILENCED_SYSTEM_CHECKS = [
+    # Some indexes use INCLUDE columns, which are only supported on PostgreSQL. Other
+    # backends just create them as regular indexes.
+    "models.W040",
+]
+
+
+# Application settings
+
+#: Use the asynchronous variants of the data views. These run independent queries
+#: concurrently and are recommended when deploying on an ASGI server.
+ASYNC_VIEWS = False
+
+#: Number of threads (and therefore database connections) per worker process that the
+#: asynchronous views may use to run queries concurrently.
+QUERY_THREAD_COUNT = 8
+
+#: Number of seconds that browsers and shared caches may reuse responses that only
+#: depend on the dataset before revalidating them.
+HTTP_CACHE_MAX_AGE = 300
+
+#: Dotted path to the class that is used for searching ingredients. When this is
+#: ``None``, a backend matching the database is chosen. See cookpot.ingredients.search.
+SEARCH_BACKEND = None
+
+#: Client addresses that may access the metrics endpoint. Metrics are only collected
+#: when "cookpot.ingredients.instrumentation.MetricsMiddleware" is added to MIDDLEWARE.
+METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]
+
+#: Requests to the data views that take longer than this (in seconds) are captured
+#: when "cookpot.ingredients.instrumentation.SlowRequestCaptureMiddleware" is added to
+#: MIDDLEWARE. Use the replay command to run them again.
+SLOW_REQUEST_THRESHOLD = 1.0
+
+#: Clients that may use the profiling mode, no matter whether DEBUG is on. Add
+#: "127.0.0.1" for local development, but not behind a reverse proxy that connects
+#: from there. Profiling is only available when
+#: "cookpot.ingredients.instrumentation.ProfilingMiddleware" is added to MIDDLEWARE.
+#: It only supports synchronous requests, so leave it out on ASGI servers.
+INTERNAL_IPS = list[str]()
+
+#: Pairing requests are considered heavy when the selected ingredients contain more
+#: than this many molecules in total. Heavy requests go through admission control,
+#: unless their results are already cached.
+PAIRING_HEAVY_COST = 1000
+
+#: Number of heavy pairing requests that may be calculated at the same time in each
+#: worker process.
+PAIRING_HEAVY_CONCURRENCY = 2
+
+#: Number of heavy pairing requests that may wait for a free slot. Further requests
+#: are rejected with "503 Service Unavailable" right away.
+PAIRING_HEAVY_QUEUE_SIZE = 8
+
+#: Number of seconds that a heavy pairing request waits for a free slot before it is
+#: rejected.
+PAIRING_HEAVY_QUEUE_TIMEOUT = 2.0
+
+#: Calculate heavy pairing requests in the background instead of in the web worker.
+#: Clients then receive a job to poll. This requires the pairingworker command to be
+#: running.
+PAIRING_JOB_QUEUE = False
+
+#: Number of seconds after which a running pairing job is assumed to have been
+#: abandoned by its worker, so that another worker may pick it up.
+PAIRING_JOB_TIMEOUT = 300
+
+#: Serve the collected static files (see the buildstatic command) from Django, using
+#: their pre-compressed variants and long-lived caching headers. Leave this off when a
+#: proxy serves STATIC_ROOT directly.
+SERVE_STATIC = False
+
+#: Give collected static files a content hash in their name and pre-compressed
+#: variants. Pages can then only be rendered (with DEBUG off) after the buildstatic
+#: command has run, so only turn this on in deployments that run it.
+HASHED_STATIC_FILES = False
+
+#: The Sass compiler that the buildstatic command uses for the stylesheet.
+SASS_BINARY = "sass"
+
 try:
     from local_settings import *
 except ImportError:
     pass
 
+if HASHED_STATIC_FILES:
+    STATICFILES_STORAGE = (
+        "cookpot.ingredients.compression.CompressedManifestStaticFilesStorage"
+    )
+
 #: Cap the number of ingredients that will be processed together.
 INGREDIENT_COUNT_CAP = 9
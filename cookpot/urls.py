@@ -3,22 +3,67 @@
 See here for more information:
 https://docs.djangoproject.com/en/4.0/topics/http/urls/
 """
+import re
+
 from django.conf import settings
 from django.conf.urls.static import static
-from django.urls import path
+from django.urls import path, re_path
 
 from .ingredients import views as ingredients_views
 
+if settings.ASYNC_VIEWS:
+    section_cards_view = ingredients_views.section_cards_async
+    pairing_results_view = ingredients_views.pairing_results_async
+else:
+    section_cards_view = ingredients_views.section_cards
+    pairing_results_view = ingredients_views.PairingResultsView.as_view()
+
 urlpatterns = [
     path("", ingredients_views.index, name="index"),
     path(
         "_data/section_cards",
-        ingredients_views.section_cards,
+        section_cards_view,
         name="section_cards",
     ),
+    path(
+        "_data/autocomplete",
+        ingredients_views.autocomplete,
+        name="autocomplete",
+    ),
     path(
         "_data/pairing_results",
-        ingredients_views.PairingResultsView.as_view(),
+        pairing_results_view,
         name="pairing_results",
     ),
-] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+    path(
+        "_data/more_suggestions",
+        ingredients_views.more_suggestions,
+        name="more_suggestions",
+    ),
+    path(
+        "_data/flavor_vectors",
+        ingredients_views.flavor_vectors,
+        name="flavor_vectors",
+    ),
+    path(
+        "_data/pairing_job",
+        ingredients_views.pairing_job,
+        name="pairing_job",
+    ),
+    path(
+        "_data/pairing_explanation",
+        ingredients_views.pairing_explanation,
+        name="pairing_explanation",
+    ),
+    path("_internal/metrics", ingredients_views.metrics, name="metrics"),
+]
+
+if settings.SERVE_STATIC:
+    urlpatterns.append(
+        re_path(
+            rf"^{re.escape(settings.STATIC_URL.lstrip('/'))}(?P<path>.+)$",
+            ingredients_views.static_file,
+        )
+    )
+else:
+    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
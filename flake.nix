@@ -11,8 +11,10 @@
       pythonDependencies = (pythonPackages: with pythonPackages; [
       	# Runtime
         django_4
+        numpy
         psycopg2
         requests
+        scipy
         # Tests
         hypothesis
         pytest
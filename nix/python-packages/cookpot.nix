@@ -1,8 +1,10 @@
 { buildPythonPackage
 , django_4
+, numpy
 , psycopg2
 , requests
 , sass
+, scipy
 }:
 
 buildPythonPackage rec {
@@ -11,11 +13,14 @@ buildPythonPackage rec {
 
   src = ../..;
 
+  # Only the stylesheet is built here. Deployments that set HASHED_STATIC_FILES must
+  # still run "cookpot buildstatic --skip-sass" before starting the server, because
+  # pages can't be rendered without the collected manifest.
   preConfigure = ''
-  	${sass}/bin/sass cookpot/static/main.scss:cookpot/static/main.css
+  	${sass}/bin/sass --no-source-map --style=compressed cookpot/static/main.scss:cookpot/static/main.css
   '';
 
-  propagatedBuildInputs = [ django_4 psycopg2 requests ];
+  propagatedBuildInputs = [ django_4 numpy psycopg2 requests scipy ];
 
   pythonImportsCheck = [ "cookpot" ];
 }
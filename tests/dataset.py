@@ -0,0 +1,113 @@
+"""Synthetic dataset and base test case for tests that need ingredient data."""
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from cookpot.ingredients.admission import _molecule_counts
+from cookpot.ingredients.autocomplete import _completion_index
+from cookpot.ingredients.dataset import create_version, publish_version
+from cookpot.ingredients.models import (
+    Ingredient,
+    IngredientName,
+    Molecule,
+    MoleculeOccurrence,
+)
+from cookpot.ingredients.pagerank import _transition_graph, store_transition_graph
+from cookpot.ingredients.postings import _postings_index, store_postings_index
+from cookpot.ingredients.ranking import RANKING_CACHE
+from cookpot.ingredients.search import get_search_backend
+from cookpot.ingredients.sections import FRAGMENT_CACHE, summarize_sections
+
+#: Size of the synthetic dataset. This needs to be large enough that the query
+#: planner actually prefers indexes where we expect them.
+INGREDIENT_COUNT = 600
+MOLECULE_COUNT = 2000
+OCCURRENCES_PER_INGREDIENT = 40
+
+
+def load_dataset() -> None:
+    """Fill the database with a random (but reproducible) dataset and publish it."""
+    rng = random.Random(0)
+    categories = list(Ingredient.Category.values)
+
+    molecules = Molecule.objects.bulk_create(
+        Molecule(pubchem_id=index) for index in range(MOLECULE_COUNT)
+    )
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(category=rng.choice(categories), flavordb_id=index)
+        for index in range(INGREDIENT_COUNT)
+    )
+    IngredientName.objects.bulk_create(
+        IngredientName(
+            ingredient=ingredient,
+            label=f"{label} {index}",
+            priority=priority,
+        )
+        for index, ingredient in enumerate(ingredients)
+        for priority, label in enumerate(["Ingrédient", "Synonym"])
+    )
+    MoleculeOccurrence.objects.bulk_create(
+        MoleculeOccurrence(
+            ingredient=ingredient,
+            molecule=molecule,
+            flavordb_found=from_flavordb,
+            foodb_content_sum=0 if from_flavordb else rng.uniform(0.1, 100),
+            foodb_content_sample_count=0 if from_flavordb else rng.randint(1, 5),
+        )
+        for ingredient in ingredients
+        for molecule in rng.sample(molecules, OCCURRENCES_PER_INGREDIENT)
+        for from_flavordb in [rng.random() < 0.5]
+    )
+
+    Ingredient.objects.update_summaries()
+    get_search_backend().rebuild()
+    version = create_version(
+        sections=summarize_sections(),
+        median_foodb_content=MoleculeOccurrence.objects.get_median_foodb_content(),
+    )
+    store_postings_index(version)
+    store_transition_graph(version)
+    publish_version(version)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+#: Separate in-memory caches in place of the configured ones.
+TEST_CACHES = {
+    alias: {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": alias,
+    }
+    for alias in settings.CACHES
+}
+
+
+@override_settings(
+    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"], CACHES=TEST_CACHES
+)
+class DatasetTestCase(TestCase):
+    """Test case that runs against the synthetic dataset.
+
+    Each test starts without rendered fragments, rankings and process-local indexes,
+    so that it sees the same (cold) caches as the first request after a sync.
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        for cache in caches.all():
+            cache.clear()
+        load_dataset()
+
+    def setUp(self) -> None:
+        caches[FRAGMENT_CACHE].clear()
+        caches[RANKING_CACHE].clear()
+        for value in (
+            _completion_index,
+            _molecule_counts,
+            _postings_index,
+            _transition_graph,
+        ):
+            value.clear()
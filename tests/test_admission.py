@@ -0,0 +1,109 @@
+import threading
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from cookpot.ingredients import views
+from cookpot.ingredients.admission import (
+    RETRY_AFTER,
+    AdmissionGate,
+    Rejected,
+    estimate_pairing_cost,
+)
+from cookpot.ingredients.models import Ingredient
+from cookpot.ingredients.views import PairingResultsView, pairing_results_async
+
+from .dataset import DatasetTestCase
+
+
+class AdmissionGateTests(SimpleTestCase):
+    def test_full_gate(self) -> None:
+        gate = AdmissionGate(max_concurrent=2, max_waiting=1, timeout=0.01)
+        self.assertTrue(gate.try_acquire())
+        self.assertTrue(gate.try_acquire())
+        # This one waits in the queue until the timeout.
+        self.assertFalse(gate.try_acquire())
+        gate.release()
+        self.assertTrue(gate.try_acquire())
+
+    def test_full_queue(self) -> None:
+        gate = AdmissionGate(max_concurrent=1, max_waiting=1, timeout=5)
+        self.assertTrue(gate.try_acquire())
+        results = list[bool]()
+        waiting_thread = threading.Thread(
+            target=lambda: results.append(gate.try_acquire())
+        )
+        waiting_thread.start()
+        with gate._condition:
+            self.assertTrue(gate._condition.wait_for(lambda: gate._waiting_count == 1))
+        # The queue is full, so this is rejected without waiting.
+        self.assertFalse(gate.try_acquire())
+
+        gate.release()
+        waiting_thread.join(5)
+        self.assertEqual(results, [True])
+
+    def test_admit(self) -> None:
+        gate = AdmissionGate(max_concurrent=1, max_waiting=0, timeout=0)
+        with gate.admit():
+            with self.assertRaises(Rejected):
+                with gate.admit():
+                    pass
+        with self.assertRaises(ValueError):
+            with gate.admit():
+                raise ValueError()
+        # Both slots were released again.
+        self.assertTrue(gate.try_acquire())
+
+
+@override_settings(PAIRING_HEAVY_COST=0)
+class PairingAdmissionTests(DatasetTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.gate = AdmissionGate(max_concurrent=1, max_waiting=0, timeout=0)
+        gate_patch = mock.patch.object(
+            views, "get_pairing_gate", return_value=self.gate
+        )
+        gate_patch.start()
+        self.addCleanup(gate_patch.stop)
+        # The async view checks the molecule counts on the query thread pool, which
+        # can't see the test data.
+        estimate_pairing_cost([])
+
+        ingredient_pk = Ingredient.objects.filter_with_data().values("pk")[0]["pk"]
+        self.url = f"{reverse('pairing_results')}?ingredients={ingredient_pk}"
+
+    def assertRejected(self, response: HttpResponse) -> None:
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], str(RETRY_AFTER))
+
+    def test_rejected(self) -> None:
+        self.assertTrue(self.gate.try_acquire())
+        with self.assertLogs("django.request"):
+            self.assertRejected(self.client.get(self.url))
+
+        self.gate.release()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertTrue(self.gate.try_acquire())
+
+    def test_released_on_error(self) -> None:
+        with mock.patch.object(
+            PairingResultsView, "get_context_data", side_effect=ValueError()
+        ):
+            with self.assertRaises(ValueError), self.assertLogs("django.request"):
+                self.client.get(self.url)
+        self.assertTrue(self.gate.try_acquire())
+
+    async def test_async_rejected(self) -> None:
+        self.assertTrue(self.gate.try_acquire())
+        self.assertRejected(await pairing_results_async(RequestFactory().get(self.url)))
+
+    async def test_async_released_on_error(self) -> None:
+        with mock.patch.object(
+            PairingResultsView, "get_matching_score", side_effect=ValueError()
+        ), mock.patch.object(PairingResultsView, "get_suggestions"):
+            with self.assertRaises(ValueError):
+                await pairing_results_async(RequestFactory().get(self.url))
+        self.assertTrue(self.gate.try_acquire())
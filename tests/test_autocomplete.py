@@ -0,0 +1,91 @@
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from cookpot.ingredients.autocomplete import (
+    MAX_COMPLETIONS,
+    Completion,
+    CompletionIndex,
+)
+from cookpot.ingredients.search import fold
+
+from .dataset import DatasetTestCase
+
+#: Names as (ingredient ID, priority, label).
+NAMES = [
+    (1, 0, "Cream"),
+    (1, 1, "Crème"),
+    (2, 0, "Cress"),
+    (3, 0, "Crémant"),
+    (4, 0, "Cajun spice"),
+    (4, 1, "Creole spice"),
+    (5, 0, "Apple"),
+]
+
+
+class CompletionIndexTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.index = CompletionIndex(
+            Completion(priority, fold(label), label, ingredient_id)
+            for ingredient_id, priority, label in NAMES
+        )
+
+    def complete(self, prefix: str, limit: int = 10) -> list[str]:
+        return [completion.label for completion in self.index.complete(prefix, limit)]
+
+    def test_prefix(self) -> None:
+        # Primary names come first, then alphabetically. Ingredient 1 also has a name
+        # starting with "cre", but it is only listed once.
+        self.assertEqual(
+            self.complete("cre"), ["Cream", "Crémant", "Cress", "Creole spice"]
+        )
+        self.assertEqual(self.complete("cress"), ["Cress"])
+        self.assertEqual(self.complete("spice"), [])
+        self.assertEqual(self.complete("x"), [])
+        self.assertEqual(self.complete(""), [])
+
+    def test_precomputed_prefix(self) -> None:
+        self.assertEqual(
+            self.complete("c"), ["Cajun spice", "Cream", "Crémant", "Cress"]
+        )
+        self.assertEqual(
+            self.complete("cr"), ["Cream", "Crémant", "Cress", "Creole spice"]
+        )
+
+    def test_accents_and_case(self) -> None:
+        self.assertEqual(self.complete("CRÉM"), ["Crémant", "Crème"])
+        self.assertEqual(self.complete("crem"), ["Crémant", "Crème"])
+        self.assertEqual(self.complete("Crè"), self.complete("cre"))
+
+    def test_limit(self) -> None:
+        self.assertEqual(self.complete("cre", 2), ["Cream", "Crémant"])
+        self.assertEqual(self.complete("c", 1), ["Cajun spice"])
+
+
+class AutocompleteViewTests(DatasetTestCase):
+    def get_completions(self, **parameters: object) -> list[dict[str, object]]:
+        response = self.client.get(reverse("autocomplete"), parameters)
+        self.assertEqual(response.status_code, 200)
+        completions = response.json()["completions"]
+        assert isinstance(completions, list)
+        return completions
+
+    def test_completions(self) -> None:
+        labels = [
+            completion["label"] for completion in self.get_completions(query="INGRED")
+        ]
+        self.assertEqual(len(labels), 10)
+        self.assertTrue(all(str(label).startswith("Ingrédient ") for label in labels))
+        self.assertEqual(labels, sorted(labels))
+
+        self.assertEqual(len(self.get_completions(query="syn", limit=3)), 3)
+        self.assertEqual(
+            len(self.get_completions(query="syn", limit=1000)), MAX_COMPLETIONS
+        )
+
+    def test_invalid_limit(self) -> None:
+        for limit in ("0", "ten"):
+            with self.subTest(limit), self.assertLogs("django.request", "WARNING"):
+                response = self.client.get(
+                    reverse("autocomplete"), {"query": "syn", "limit": limit}
+                )
+                self.assertEqual(response.status_code, 400)
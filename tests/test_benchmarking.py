@@ -0,0 +1,32 @@
+import math
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.test import SimpleTestCase
+
+from cookpot.ingredients.benchmarking import InProcessTarget, percentile
+from cookpot.ingredients.ranking import RANKING_CACHE
+from cookpot.ingredients.sections import FRAGMENT_CACHE
+
+
+class PercentileTests(SimpleTestCase):
+    def test_nearest_rank(self) -> None:
+        values = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self.assertEqual(percentile(values, 0.5), 3.0)
+        self.assertEqual(percentile(values, 0.95), 5.0)
+        self.assertEqual(percentile([1.0, 2.0, 3.0, 4.0], 0.5), 2.0)
+        self.assertEqual(percentile([1.0, 2.0, 3.0, 4.0], 0.75), 3.0)
+
+    def test_bounds(self) -> None:
+        values = [1.0, 2.0, 3.0]
+        self.assertEqual(percentile(values, 0.0), 1.0)
+        self.assertEqual(percentile(values, 1.0), 3.0)
+        self.assertTrue(math.isnan(percentile([], 0.5)))
+
+
+class InProcessTargetTests(SimpleTestCase):
+    def test_disabled_caches(self) -> None:
+        with InProcessTarget(disabled_caches=[FRAGMENT_CACHE]):
+            self.assertIsInstance(caches[FRAGMENT_CACHE], DummyCache)
+            self.assertNotIsInstance(caches[RANKING_CACHE], DummyCache)
+        self.assertNotIsInstance(caches[FRAGMENT_CACHE], DummyCache)
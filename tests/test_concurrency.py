@@ -0,0 +1,128 @@
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from cookpot.ingredients import concurrency
+from cookpot.ingredients.concurrency import SingleFlight
+
+from .dataset import TEST_CACHES
+
+#: Number of threads that ask for the same value at the same time.
+THREAD_COUNT = 8
+
+
+class _WaiterCountingEvent(threading.Event):
+    def __init__(self) -> None:
+        super().__init__()
+        self.waiter_count = 0
+        self._count_lock = threading.Lock()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        with self._count_lock:
+            self.waiter_count += 1
+        return super().wait(timeout)
+
+
+class _TrackedCall(concurrency._Call):
+    def __init__(self) -> None:
+        super().__init__()
+        self.done = _WaiterCountingEvent()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self) -> None:
+        caches["default"].clear()
+        self.single_flight = SingleFlight("default", lock_timeout=1, poll_interval=0.01)
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calculate = mock.Mock(side_effect=self.wait_for_release)
+        tracking_patch = mock.patch.object(concurrency, "_Call", _TrackedCall)
+        tracking_patch.start()
+        self.addCleanup(tracking_patch.stop)
+
+    def wait_for_release(self) -> object:
+        self.started.set()
+        self.assertTrue(self.release.wait(5))
+        # A new object for each call, so that shared results can be told apart.
+        return ["value"]
+
+    def raise_after_release(self, error: Exception) -> Callable[[], object]:
+        def calculate() -> object:
+            self.wait_for_release()
+            raise error
+
+        return calculate
+
+    def get_concurrently(self, key: str) -> list[Future[object]]:
+        """Ask for a key from many threads while the first calculation is blocked."""
+        executor = ThreadPoolExecutor(THREAD_COUNT)
+        self.addCleanup(executor.shutdown)
+        futures = [executor.submit(self.single_flight.get, key, self.calculate)]
+        self.assertTrue(self.started.wait(5))
+        futures += [
+            executor.submit(self.single_flight.get, key, self.calculate)
+            for _ in range(THREAD_COUNT - 1)
+        ]
+
+        # Only let the calculation finish once all other threads are waiting for it.
+        call = self.single_flight._calls[key, None]
+        deadline = time.monotonic() + 5
+        while call.done.waiter_count < THREAD_COUNT - 1:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.001)
+        self.release.set()
+        return futures
+
+    def test_shared_calculation(self) -> None:
+        futures = self.get_concurrently("key")
+        results = [future.result(5) for future in futures]
+        self.calculate.assert_called_once()
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(self.single_flight._calls, {})
+        self.assertIsNone(caches["default"].get("key:lock"))
+
+        # The result was also stored in the shared cache.
+        self.assertEqual(self.single_flight.get("key", self.calculate), ["value"])
+        self.calculate.assert_called_once()
+
+    def test_shared_error(self) -> None:
+        error = ValueError("calculation failed")
+        self.calculate.side_effect = self.raise_after_release(error)
+        futures = self.get_concurrently("key")
+        for future in futures:
+            self.assertIs(future.exception(5), error)
+        self.calculate.assert_called_once()
+        self.assertEqual(self.single_flight._calls, {})
+        self.assertIsNone(caches["default"].get("key:lock"))
+
+        # Failures are not cached, so the next call calculates the value again.
+        self.calculate.side_effect = None
+        self.calculate.return_value = "value"
+        self.assertEqual(self.single_flight.get("key", self.calculate), "value")
+        self.assertEqual(self.calculate.call_count, 2)
+
+    def test_lock_held_elsewhere(self) -> None:
+        # Another process is calculating the value and stores it after a while.
+        cache = caches["default"]
+        cache.add("key:lock", True)
+        timer = threading.Timer(0.05, cache.set, ["key", "value"])
+        timer.start()
+        self.addCleanup(timer.cancel)
+        self.assertEqual(self.single_flight.get("key", self.calculate), "value")
+        self.calculate.assert_not_called()
+
+    def test_lock_timeout(self) -> None:
+        # The process holding the lock never stores a value.
+        caches["default"].add("key:lock", True)
+        self.single_flight.lock_timeout = 0.05
+        self.calculate.side_effect = None
+        self.calculate.return_value = "value"
+        self.assertEqual(self.single_flight.get("key", self.calculate), "value")
+        self.calculate.assert_called_once()
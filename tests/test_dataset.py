@@ -0,0 +1,91 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from cookpot.ingredients.dataset import (
+    VERSION_CHECK_INTERVAL,
+    VersionedValue,
+    create_version,
+    get_current_version,
+    publish_version,
+)
+
+from .dataset import TEST_CACHES
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PublishVersionTests(TestCase):
+    def test_unpublished_version(self) -> None:
+        published_version = create_version()
+        publish_version(published_version)
+        version = create_version()
+        self.assertEqual(get_current_version(), published_version)
+        # Without the cache, the version is looked up in the database.
+        caches["default"].clear()
+        self.assertEqual(get_current_version(), published_version)
+        publish_version(version)
+        self.assertEqual(get_current_version(), version)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class VersionedValueTests(TestCase):
+    def setUp(self) -> None:
+        caches["default"].clear()
+        publish_version(create_version())
+
+    def test_version_check_interval(self) -> None:
+        values = iter(range(10))
+        versioned_value = VersionedValue(lambda: next(values))
+
+        with mock.patch("time.monotonic", return_value=1000.0):
+            self.assertEqual(versioned_value.get(), 0)
+            publish_version(create_version())
+            # The new version isn't looked up until the interval has passed.
+            with mock.patch(
+                "cookpot.ingredients.dataset.get_current_version"
+            ) as get_current_version:
+                self.assertEqual(versioned_value.get(), 0)
+            get_current_version.assert_not_called()
+
+        with mock.patch(
+            "time.monotonic", return_value=1000.0 + VERSION_CHECK_INTERVAL
+        ):
+            self.assertEqual(versioned_value.get(), 1)
+            self.assertEqual(versioned_value.get(), 1)
+
+    def test_stale_value_while_building(self) -> None:
+        started = threading.Event()
+        release = threading.Event()
+
+        def build() -> int:
+            if versioned_value._value is not None:
+                started.set()
+                self.assertTrue(release.wait(5))
+            return next(values)
+
+        values = iter(range(10))
+        versioned_value = VersionedValue(build)
+        self.assertEqual(versioned_value.get(), 0)
+        publish_version(create_version())
+
+        with mock.patch(
+            "time.monotonic", return_value=time.monotonic() + VERSION_CHECK_INTERVAL
+        ), ThreadPoolExecutor(1) as executor:
+            future = executor.submit(versioned_value.get)
+            self.assertTrue(started.wait(5))
+            # The value is built outside of the lock, so this doesn't block.
+            self.assertEqual(versioned_value.get(), 0)
+            release.set()
+            self.assertEqual(future.result(5), 1)
+            self.assertEqual(versioned_value.get(), 1)
+
+    def test_clear(self) -> None:
+        values = iter(range(10))
+        versioned_value = VersionedValue(lambda: next(values))
+        self.assertEqual(versioned_value.get(), 0)
+        versioned_value.clear()
+        self.assertEqual(versioned_value.get(), 1)
@@ -0,0 +1,103 @@
+import io
+import tarfile
+import tempfile
+import zipfile
+from pathlib import Path
+from unittest import mock
+
+import requests
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+from cookpot.ingredients.flavordb import iter_mirror, parse_entity
+
+ENTITIES = {
+    1: b'{"entity_id": 1, "entity_alias_readable": "Apple"}',
+    2: b"null",
+    10: b'{"entity_id": 10, "entity_alias_readable": "Pear"}',
+}
+
+
+def _response(status_code: int, content: bytes = b"") -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    return response
+
+
+class MirrorTests(SimpleTestCase):
+    def setUp(self) -> None:
+        temporary_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_directory.cleanup)
+        self.path = Path(temporary_directory.name)
+        self.mirror_path = self.path / "mirror"
+        (self.mirror_path / "nested").mkdir(parents=True)
+        for entity_id, content in ENTITIES.items():
+            directory = self.mirror_path / ("nested" if entity_id == 10 else "")
+            (directory / f"{entity_id}.json").write_bytes(content)
+        (self.mirror_path / "README.txt").write_bytes(b"Not an entity.")
+
+    def test_directory(self) -> None:
+        self.assertEqual(
+            list(iter_mirror(str(self.mirror_path))), sorted(ENTITIES.items())
+        )
+
+    def test_zip(self) -> None:
+        archive_path = self.path / "mirror.zip"
+        with zipfile.ZipFile(archive_path, "w") as archive:
+            for entity_id, content in reversed(ENTITIES.items()):
+                archive.writestr(f"flavordb/{entity_id}.json", content)
+        self.assertEqual(list(iter_mirror(str(archive_path))), sorted(ENTITIES.items()))
+
+    def test_tar(self) -> None:
+        archive_path = self.path / "mirror.tar.gz"
+        with tarfile.open(archive_path, "w:gz") as archive:
+            for entity_id, content in ENTITIES.items():
+                member = tarfile.TarInfo(f"./{entity_id}.json")
+                member.size = len(content)
+                archive.addfile(member, io.BytesIO(content))
+        self.assertEqual(list(iter_mirror(str(archive_path))), list(ENTITIES.items()))
+
+    def test_invalid_path(self) -> None:
+        with self.assertRaises(ValueError):
+            list(iter_mirror(str(self.mirror_path / "README.txt")))
+
+    def test_parse_entity(self) -> None:
+        self.assertEqual(parse_entity(b"null"), (None, ""))
+        self.assertEqual(parse_entity(ENTITIES[1])[0]["entity_id"], 1)
+        self.assertNotEqual(parse_entity(b"<html>")[1], "")
+
+    def test_mirror_command(self) -> None:
+        responses = {
+            0: _response(404),
+            1: _response(200, ENTITIES[1]),
+            2: _response(500),
+            3: _response(200, b"<html>"),
+        }
+
+        def get(url: str, params: dict[str, int], **kwargs: object) -> object:
+            return responses[params["id"]]
+
+        output = self.path / "download"
+        with mock.patch.object(requests.Session, "get", side_effect=get):
+            with self.assertLogs(level="ERROR") as logs:
+                with self.assertRaises(CommandError):
+                    call_command("mirrorflavordb", str(output), count=4)
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(
+            list(iter_mirror(str(output))), [(0, b"null"), (1, ENTITIES[1])]
+        )
+
+        # Only the entities that failed are downloaded again.
+        responses[2] = _response(404)
+        responses[3] = _response(200, ENTITIES[10])
+        with mock.patch.object(requests.Session, "get", side_effect=get) as session_get:
+            call_command("mirrorflavordb", str(output), count=4)
+        self.assertEqual(
+            [call.kwargs["params"]["id"] for call in session_get.call_args_list], [2, 3]
+        )
+        self.assertEqual(
+            list(iter_mirror(str(output))),
+            [(0, b"null"), (1, ENTITIES[1]), (2, b"null"), (3, ENTITIES[10])],
+        )
@@ -0,0 +1,51 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from cookpot.ingredients.instrumentation import (
+    MetricsRegistry,
+    ProfilingMiddleware,
+    QueryRecord,
+    QueryRecorder,
+)
+
+
+class MetricsRegistryTests(SimpleTestCase):
+    def test_slowest_query(self) -> None:
+        registry = MetricsRegistry()
+        for index, duration in enumerate([0.5, 2.0, 1.0]):
+            recorder = QueryRecorder()
+            recorder.slowest = QueryRecord(f"SELECT {index}", (), duration)
+            registry.observe("pairing_results", 0.1, recorder)
+
+        lines = registry.render().splitlines()
+        self.assertIn(
+            'cookpot_slowest_query_seconds{view="pairing_results"} 2.0', lines
+        )
+        # Statements would be an unbounded label.
+        self.assertFalse(any("SELECT" in line for line in lines))
+
+    def test_counters(self) -> None:
+        registry = MetricsRegistry()
+        registry.increment("cookpot_expired_rankings_total", reason="version")
+        registry.increment("cookpot_expired_rankings_total", reason="version")
+        registry.increment("cookpot_expired_rankings_total", reason="evicted")
+        lines = registry.render().splitlines()
+        self.assertIn('cookpot_expired_rankings_total{reason="version"} 2', lines)
+        self.assertIn('cookpot_expired_rankings_total{reason="evicted"} 1', lines)
+
+
+@override_settings(INTERNAL_IPS=["10.0.0.1"])
+class ProfilingMiddlewareTests(SimpleTestCase):
+    def should_profile(self, remote_addr: str) -> bool:
+        middleware = ProfilingMiddleware(lambda request: HttpResponse())
+        request = RequestFactory().get(
+            reverse("pairing_results"), {"_profile": ""}, REMOTE_ADDR=remote_addr
+        )
+        return middleware.should_profile(request)
+
+    def test_internal_ips(self) -> None:
+        self.assertTrue(self.should_profile("10.0.0.1"))
+        for debug in (False, True):
+            with self.subTest(debug=debug), self.settings(DEBUG=debug):
+                self.assertFalse(self.should_profile("10.0.0.2"))
@@ -0,0 +1,31 @@
+from cookpot.ingredients.models import Ingredient
+from cookpot.ingredients.postings import PostingsIndex
+from cookpot.ingredients.views import PairingResultsView
+
+from .dataset import DatasetTestCase
+
+
+class PostingsIndexTests(DatasetTestCase):
+    def test_explain_matches_ranking(self) -> None:
+        postings_index = PostingsIndex.from_database()
+        ingredient_pks = list(
+            Ingredient.objects.filter_with_data()
+            .order_by("pk")
+            .values_list("pk", flat=True)[:3]
+        )
+        ranking = PairingResultsView.rank_suggested_ingredients(ingredient_pks)
+        for candidate_pk, weighted_score in ranking[:5] + ranking[-5:]:
+            with self.subTest(candidate=candidate_pk):
+                contributions = postings_index.explain(ingredient_pks, candidate_pk)
+                self.assertAlmostEqual(
+                    sum(contribution.score for contribution in contributions),
+                    weighted_score,
+                )
+                self.assertEqual(
+                    contributions,
+                    sorted(contributions, key=lambda contribution: -contribution.score),
+                )
+
+    def test_explain_unknown_ingredients(self) -> None:
+        postings_index = PostingsIndex.from_database()
+        self.assertEqual(postings_index.explain([-1], -2), [])
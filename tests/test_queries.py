@@ -0,0 +1,254 @@
+"""Checks for the number of queries of each view and for regressions in their plans.
+
+The plans of the pairing and search queries are compared against the snapshot in
+``query_plans.json``: a query that reads a whole table where the snapshot used an index
+fails the test. Record intentional plan changes by running the tests with the
+``UPDATE_QUERY_PLANS`` environment variable set.
+"""
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from cookpot.ingredients.admission import estimate_pairing_cost
+from cookpot.ingredients.concurrency import execute_wrapper
+from cookpot.ingredients.dataset import get_current_version
+from cookpot.ingredients.instrumentation import QueryRecorder, explain
+from cookpot.ingredients.models import Ingredient
+from cookpot.ingredients.ranking import RANKING_CACHE, Cursor
+from cookpot.ingredients.sections import summarize_sections
+from cookpot.ingredients.views import SUGGESTION_PAGE_SIZE, PairingResultsView
+
+from .dataset import DatasetTestCase
+
+SNAPSHOT_PATH = Path(__file__).resolve().parent / "query_plans.json"
+
+#: Patterns that find tables which are read in full in a (text) query plan.
+FULL_SCAN_PATTERNS = {
+    # SQLite plans contain lines like "SCAN ingredients_ingredient" for full scans,
+    # while index scans are followed by "USING [COVERING] INDEX".
+    "sqlite": re.compile(r"^SCAN (\w+)$", re.MULTILINE),
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+}
+
+
+def get_urls() -> dict[str, str]:
+    """Return the URLs of the requests that are checked, by label."""
+    section = summarize_sections()[0]["key"]
+    ingredient_pks = list(
+        Ingredient.objects.filter_with_data()
+        .order_by("pk")
+        .values_list("pk", flat=True)[: settings.INGREDIENT_COUNT_CAP]
+    )
+    ingredients = ",".join(map(str, ingredient_pks))
+    last_pk, last_score = PairingResultsView.rank_suggested_ingredients(
+        ingredient_pks
+    )[SUGGESTION_PAGE_SIZE - 1]
+    caches[RANKING_CACHE].clear()
+    version = get_current_version()
+    assert version is not None
+    after = Cursor(version.pk, last_score, last_pk).encode()
+
+    section_url = reverse("section_cards")
+    autocomplete_url = reverse("autocomplete")
+    pairing_url = reverse("pairing_results")
+    return {
+        "index": reverse("index"),
+        "section": f"{section_url}?{urlencode({'section': section})}",
+        "search": f"{section_url}?{urlencode({'query': 'ingredient 1'})}",
+        "autocomplete": f"{autocomplete_url}?query=ing",
+        "autocomplete (other)": f"{autocomplete_url}?query=syn",
+        "flavor vectors": reverse("flavor_vectors"),
+        "pairing (single)": (
+            f"{pairing_url}?{urlencode({'ingredients': ingredient_pks[0]})}"
+        ),
+        "pairing (full)": f"{pairing_url}?{urlencode({'ingredients': ingredients})}",
+        "pairing (more)": reverse("more_suggestions")
+        + "?"
+        + urlencode({"ingredients": ingredients, "after": after}),
+        "pairing (filtered)": pairing_url
+        + "?"
+        + urlencode({"ingredients": ingredients, "include": section}),
+        "pairing (pagerank)": pairing_url
+        + "?"
+        + urlencode({"ingredients": ingredients, "ranking": "pagerank"}),
+        "pairing explanation": reverse("pairing_explanation")
+        + "?"
+        + urlencode({"ingredients": ingredients, "candidate": last_pk}),
+    }
+
+
+def get_plans(url: str) -> list[str]:
+    """Request a URL and return the plan of each query it ran."""
+    recorder = QueryRecorder(keep_queries=True)
+    with execute_wrapper(recorder):
+        Client().get(url, HTTP_CACHE_CONTROL="no-cache")
+    return [explain(query.sql, query.params) or "" for query in recorder.queries]
+
+
+def get_update_plans() -> list[str]:
+    """Recalculate the ingredient summaries and return the plan of each statement."""
+    recorder = QueryRecorder(keep_queries=True)
+    with execute_wrapper(recorder):
+        Ingredient.objects.update_summaries()
+
+    # explain() only handles reading statements, because it might run them.
+    prefix = "EXPLAIN QUERY PLAN " if connection.vendor == "sqlite" else "EXPLAIN "
+    plans = list[str]()
+    with connection.cursor() as cursor:
+        for query in recorder.queries:
+            cursor.execute(prefix + query.sql, query.params)
+            plans.append("\n".join(str(row[-1]) for row in cursor.fetchall()))
+    return plans
+
+
+def find_full_scans(plan: str) -> list[str]:
+    """Find the tables that a query plan reads in full."""
+    return sorted(
+        {
+            table
+            for table in FULL_SCAN_PATTERNS[connection.vendor].findall(plan)
+            if table.startswith("ingredients_")
+        }
+    )
+
+
+class QueryCountTests(DatasetTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.urls = get_urls()
+
+    def assertQueryCount(self, label: str, count: int) -> None:
+        with self.assertNumQueries(count):
+            response = self.client.get(self.urls[label])
+        self.assertEqual(response.status_code, 200, label)
+
+    def test_index(self) -> None:
+        self.assertQueryCount("index", 0)
+
+    def test_section(self) -> None:
+        self.assertQueryCount("section", 1)
+        self.assertQueryCount("section", 0)
+
+    def test_search(self) -> None:
+        self.assertQueryCount("search", 2)
+
+    def test_autocomplete(self) -> None:
+        self.assertQueryCount("autocomplete", 1)
+        self.assertQueryCount("autocomplete (other)", 0)
+
+    def test_flavor_vectors(self) -> None:
+        self.assertQueryCount("flavor vectors", 1)
+        self.assertQueryCount("flavor vectors", 0)
+
+    def test_pairing(self) -> None:
+        # The first pairing request also loads the molecule counts that are used for
+        # admission control.
+        self.assertQueryCount("pairing (single)", 5)
+        self.assertQueryCount("pairing (full)", 4)
+        # The ranking of the previous request is reused here.
+        self.assertQueryCount("pairing (more)", 1)
+        # The matching score is reused for the following requests.
+        self.assertQueryCount("pairing (filtered)", 2)
+        # The PageRank ranking doesn't need the database.
+        self.assertQueryCount("pairing (pagerank)", 1)
+        self.assertQueryCount("pairing explanation", 0)
+
+
+class QueryPlanTests(DatasetTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        if connection.vendor not in FULL_SCAN_PATTERNS:
+            self.skipTest(f"Unsupported database: {connection.vendor}")
+        self.urls = get_urls()
+        # Load the molecule counts for admission control, so that only the queries
+        # of the pairing calculation itself are compared.
+        estimate_pairing_cost([])
+
+    def test_plan_snapshot(self) -> None:
+        full_scans = {
+            label: [find_full_scans(plan) for plan in get_plans(url)]
+            for label, url in self.urls.items()
+            if label.startswith(("pairing", "search"))
+        }
+
+        try:
+            with open(SNAPSHOT_PATH, "r") as snapshot_file:
+                snapshots: dict[str, Any] = json.load(snapshot_file)
+        except FileNotFoundError:
+            snapshots = {}
+        if os.environ.get("UPDATE_QUERY_PLANS"):
+            snapshots[connection.vendor] = full_scans
+            with open(SNAPSHOT_PATH, "w") as snapshot_file:
+                json.dump(snapshots, snapshot_file, indent=2, sort_keys=True)
+                snapshot_file.write("\n")
+        snapshot = snapshots.get(connection.vendor)
+        if snapshot is None:
+            self.skipTest(
+                f"No plan snapshot for {connection.vendor}. Set UPDATE_QUERY_PLANS to "
+                f"create one."
+            )
+
+        for label, tables_by_query in full_scans.items():
+            expected_tables_by_query = snapshot.get(label, [])
+            for index, tables in enumerate(tables_by_query):
+                expected_tables = (
+                    expected_tables_by_query[index]
+                    if index < len(expected_tables_by_query)
+                    else []
+                )
+                with self.subTest(label, query=index + 1):
+                    self.assertLessEqual(
+                        set(tables),
+                        set(expected_tables),
+                        "The query now reads whole tables instead of using an index.",
+                    )
+
+
+class IndexUsageTests(DatasetTestCase):
+    """Check that the indexes which were added for specific queries are used."""
+
+    def setUp(self) -> None:
+        super().setUp()
+        if connection.vendor not in FULL_SCAN_PATTERNS:
+            self.skipTest(f"Unsupported database: {connection.vendor}")
+        self.urls = get_urls()
+        estimate_pairing_cost([])
+
+    def assertIndexUsed(self, plans: list[str], index_name: str) -> None:
+        self.assertTrue(
+            any(index_name in plan for plan in plans),
+            f"None of the plans uses {index_name}:\n" + "\n\n".join(plans),
+        )
+
+    def test_pairing(self) -> None:
+        self.assertIndexUsed(
+            get_plans(self.urls["pairing (single)"]), "occurrence_molecule_score_idx"
+        )
+
+    def test_pairing_without_full_scans(self) -> None:
+        # The median FooDB content is stored on the dataset version, so scoring
+        # doesn't read all occurrences.
+        for label in ("pairing (single)", "pairing (full)", "pairing (filtered)"):
+            for plan in get_plans(self.urls[label]):
+                with self.subTest(label):
+                    self.assertEqual(find_full_scans(plan), [], plan)
+
+    def test_search(self) -> None:
+        for plan in get_plans(self.urls["search"]):
+            self.assertEqual(find_full_scans(plan), [], plan)
+
+    def test_update_summaries(self) -> None:
+        # Since names and data flags are denormalized onto the ingredient, these
+        # indexes are only read when the summaries are recalculated.
+        plans = get_update_plans()
+        self.assertIndexUsed(plans, "occurrence_with_data_idx")
+        self.assertIndexUsed(plans, "ingredientname_priority_idx")
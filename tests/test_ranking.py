@@ -0,0 +1,186 @@
+from typing import Optional
+from urllib.parse import urlencode
+
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from cookpot.ingredients.dataset import (
+    create_version,
+    get_current_version,
+    publish_version,
+)
+from cookpot.ingredients.models import Ingredient
+from cookpot.ingredients.ranking import RANKING_CACHE, Cursor, RankingOptions, get_page
+from cookpot.ingredients.views import SUGGESTION_PAGE_SIZE, PairingResultsView
+
+from .dataset import DatasetTestCase
+
+#: Ordered by descending score and then by descending ID, like real rankings.
+RANKING = [(9, 3.0), (4, 2.0), (7, 1.0), (5, 1.0), (2, 1.0), (8, 0.5), (1, 0.0)]
+
+
+class PageTests(SimpleTestCase):
+    def get_pages(self, count: int) -> list[list[int]]:
+        pages = list[list[int]]()
+        after: Optional[Cursor] = None
+        while True:
+            page, after = get_page(RANKING, after, count, 1)
+            pages.append([ingredient_pk for ingredient_pk, _ in page])
+            if after is None:
+                return pages
+            after = Cursor.decode(after.encode())
+
+    def test_pages(self) -> None:
+        self.assertEqual(self.get_pages(3), [[9, 4, 7], [5, 2, 8], [1]])
+        self.assertEqual(self.get_pages(2), [[9, 4], [7, 5], [2, 8], [1]])
+        self.assertEqual(self.get_pages(7), [[9, 4, 7, 5, 2, 8, 1]])
+        self.assertEqual(get_page([], None, 3, 1), ([], None))
+
+    def test_missing_entry(self) -> None:
+        # The cursor still works if its entry is no longer part of the ranking.
+        page, _ = get_page(RANKING, Cursor(1, 1.0, 6), 2, 1)
+        self.assertEqual(page, [(5, 1.0), (2, 1.0)])
+        self.assertEqual(get_page(RANKING, Cursor(1, -1.0, 0), 2, 1), ([], None))
+
+    def test_encoding(self) -> None:
+        for cursor in (Cursor(12, 0.1 + 0.2, 34), Cursor(None, 0.0, 1)):
+            with self.subTest(cursor):
+                self.assertEqual(Cursor.decode(cursor.encode()), cursor)
+        for token in ("", "abc", "12", Cursor(1, 1.0, 2).encode()[:-2]):
+            with self.subTest(token), self.assertRaises(ValueError):
+                Cursor.decode(token)
+
+
+class CategoryFilterTests(DatasetTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.ingredient_pks = list(
+            Ingredient.objects.filter_with_data()
+            .order_by("pk")
+            .values_list("pk", flat=True)[:3]
+        )
+
+    def test_subcategories(self) -> None:
+        self.assertEqual(
+            RankingOptions(include=("fruit",)).categories,
+            {"fruit", "fruit-berry", "fruit-citrus", "fruit-essence"},
+        )
+        self.assertEqual(
+            RankingOptions(include=("fruit",), exclude=("fruit-berry",)).categories,
+            {"fruit", "fruit-citrus", "fruit-essence"},
+        )
+        self.assertNotIn(
+            "vegetable-fruit", RankingOptions(include=("fruit",)).categories or ()
+        )
+
+    def test_subcategory_ranking(self) -> None:
+        for mode in ("shared_molecules", "pagerank"):
+            with self.subTest(mode):
+                ranking = PairingResultsView.get_ranking(
+                    self.ingredient_pks, RankingOptions(mode, include=("vegetable",))
+                )
+                categories = set(
+                    Ingredient.objects.filter(
+                        pk__in=[pk for pk, _ in ranking]
+                    ).values_list("category", flat=True)
+                )
+                self.assertGreater(len(categories), 1)
+                self.assertLessEqual(
+                    categories, Ingredient.Category.expand(["vegetable"])
+                )
+
+    def test_overlapping_filters(self) -> None:
+        options = RankingOptions(include=("fruit",), exclude=("fruit",))
+        self.assertEqual(options.categories, frozenset())
+        for mode in ("shared_molecules", "pagerank"):
+            with self.subTest(mode):
+                self.assertEqual(
+                    PairingResultsView.get_ranking(
+                        self.ingredient_pks, options._replace(mode=mode)
+                    ),
+                    [],
+                )
+
+        parameters = {
+            "ingredients": ",".join(map(str, self.ingredient_pks)),
+            "include": "fruit",
+            "exclude": "fruit-*",
+        }
+        response = self.client.get(
+            f"{reverse('pairing_results')}?{urlencode(parameters)}"
+        )
+        self.assertEqual(response.status_code, 200)
+        version = get_current_version()
+        assert version is not None
+        after = Cursor(version.pk, 1.0, self.ingredient_pks[0]).encode()
+        response = self.client.get(
+            f"{reverse('more_suggestions')}?{urlencode({**parameters, 'after': after})}"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Next-Page", response)
+
+
+class MoreSuggestionsTests(DatasetTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        ingredient_pks = Ingredient.objects.filter_with_data().values_list(
+            "pk", flat=True
+        )
+        self.ingredients = ",".join(map(str, ingredient_pks[:2]))
+
+    def get(self, url: str) -> HttpResponse:
+        response = self.client.get(url)
+        assert isinstance(response, HttpResponse)
+        return response
+
+    def get_first_page_url(self) -> str:
+        parameters = {"ingredients": self.ingredients}
+        response = self.get(f"{reverse('pairing_results')}?{urlencode(parameters)}")
+        url = response.context["more_suggestions_url"]  # type: ignore[attr-defined]
+        assert isinstance(url, str)
+        return url
+
+    def test_pages(self) -> None:
+        ranking = PairingResultsView.get_ranking(
+            [int(pk) for pk in self.ingredients.split(",")]
+        )
+        url: Optional[str] = self.get_first_page_url()
+        ingredient_pks = [
+            ingredient_pk for ingredient_pk, _ in ranking[:SUGGESTION_PAGE_SIZE]
+        ]
+        while url is not None:
+            response = self.get(url)
+            self.assertEqual(response.status_code, 200)
+            ingredient_pks += [
+                ingredient.pk for ingredient in response.context["matching_ingredients"]
+            ]
+            url = response.get("X-Next-Page")
+        self.assertEqual(
+            ingredient_pks, [ingredient_pk for ingredient_pk, _ in ranking]
+        )
+
+    def test_evicted_ranking(self) -> None:
+        url = self.get_first_page_url()
+        expected_response = self.get(url)
+        caches[RANKING_CACHE].clear()
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected_response.content)
+        self.assertEqual(response["X-Next-Page"], expected_response["X-Next-Page"])
+
+    def test_expired_ranking(self) -> None:
+        url = self.get_first_page_url()
+        publish_version(create_version())
+        with self.assertLogs("django.request", "WARNING"):
+            response = self.get(url)
+        self.assertEqual(response.status_code, 410)
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_invalid_cursor(self) -> None:
+        parameters = {"ingredients": self.ingredients, "after": "12"}
+        url = f"{reverse('more_suggestions')}?{urlencode(parameters)}"
+        with self.assertLogs("django.request", "WARNING"):
+            response = self.get(url)
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,56 @@
+from django.db import connection
+
+from cookpot.ingredients.models import Ingredient
+from cookpot.ingredients.search import (
+    NgramSearchBackend,
+    PostgresTrigramSearchBackend,
+    SearchBackend,
+    SqliteFtsSearchBackend,
+)
+
+from .dataset import DatasetTestCase
+
+QUERIES = [
+    "ingredient 12",
+    "ingrdient 12",
+    "INGRÉDIENT 12",
+    "synonym 599",
+    "synonmy 5",
+    "Syn",
+    "12",
+    "1",
+    "t 1",
+    "xyz",
+    "",
+]
+
+
+class SearchBackendTests(DatasetTestCase):
+    def get_backends(self) -> list[SearchBackend]:
+        backends: list[SearchBackend] = [NgramSearchBackend()]
+        if connection.vendor == "sqlite":
+            backends.append(SqliteFtsSearchBackend())
+        elif connection.vendor == "postgresql":
+            backends.append(PostgresTrigramSearchBackend())
+        for backend in backends:
+            backend.rebuild()
+        return backends
+
+    def test_backends_agree(self) -> None:
+        reference_backend, *backends = self.get_backends()
+        for query in QUERIES:
+            expected = reference_backend.search(query, 30)
+            for backend in backends:
+                with self.subTest(query, backend=type(backend).__name__):
+                    self.assertEqual(backend.search(query, 30), expected)
+
+    def test_matches(self) -> None:
+        ingredient_pk = Ingredient.objects.get(name__label="Ingrédient 12").pk
+        for backend in self.get_backends():
+            with self.subTest(type(backend).__name__):
+                # Substring matches come first, no matter the case and accents.
+                self.assertEqual(backend.search("INGREDIENT 12", 1), [ingredient_pk])
+                # Typos are found by their similarity.
+                self.assertIn(ingredient_pk, backend.search("ingrdient 12", 30))
+                self.assertEqual(len(backend.search("ingredient", 7)), 7)
+                self.assertEqual(backend.search("xyz", 30), [])